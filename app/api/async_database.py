@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+import aiomysql
+from pymysql.constants import CLIENT
+from fastapi import HTTPException
+from database import DB_CONFIG, POOL_SIZE, POOL_TIMEOUT
+from metrics import observe_acquire, observe_query
+
+# Las conexiones se reciclan pasado este tiempo para evitar conexiones caídas por el servidor
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+class TimedAsyncCursor:
+    """Cursor asíncrono que mide cada sentencia; el resto se delega al cursor real."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def _timed(self, method, query, *args):
+        started = time.perf_counter()
+        try:
+            result = await method(query, *args)
+        except Exception:
+            observe_query(query, time.perf_counter() - started, failed=True)
+            raise
+        observe_query(query, time.perf_counter() - started)
+        return result
+
+    async def execute(self, query, *args):
+        return await self._timed(self._cursor.execute, query, *args)
+
+    async def executemany(self, query, *args):
+        return await self._timed(self._cursor.executemany, query, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedAsyncConnection:
+    """Conexión de aiomysql cuyos cursores miden las sentencias."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    @asynccontextmanager
+    async def cursor(self, *args):
+        async with self._connection.cursor(*args) as cursor:
+            yield TimedAsyncCursor(cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+async def get_pool():
+    """Crea el pool asíncrono la primera vez que se necesita."""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await aiomysql.create_pool(
+                    host=DB_CONFIG["host"],
+                    port=DB_CONFIG["port"],
+                    user=DB_CONFIG["user"],
+                    password=DB_CONFIG["password"],
+                    db=DB_CONFIG["database"],
+                    minsize=1,
+                    maxsize=POOL_SIZE,
+                    pool_recycle=POOL_RECYCLE,
+                    # Autocommit evita que las lecturas dejen transacciones abiertas en el pool;
+                    # las escrituras de varias sentencias usan begin()/commit() explícitos.
+                    autocommit=True,
+                    # rowcount de un UPDATE cuenta las filas encontradas aunque no cambien,
+                    # para distinguir "no existe" de "ya tenía ese valor"
+                    client_flag=CLIENT.FOUND_ROWS,
+                )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+@asynccontextmanager
+async def acquire_connection():
+    started = time.perf_counter()
+    try:
+        pool = await get_pool()
+        connection = await asyncio.wait_for(pool.acquire(), POOL_TIMEOUT)
+    except (asyncio.TimeoutError, aiomysql.Error, OSError) as e:
+        print(f"Error connecting to MySQL Database: {e}")
+        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
+    observe_acquire("async", time.perf_counter() - started)
+    try:
+        yield InstrumentedAsyncConnection(connection)
+    finally:
+        try:
+            if connection.get_transaction_status():
+                await connection.rollback()
+        except Exception as e:
+            # Conexión caída a mitad de transacción: release la cierra en lugar de devolverla
+            print(f"Error rolling back MySQL connection: {e}")
+        finally:
+            pool.release(connection)
+
+
+async def fetch_all(query, params=()):
+    async with acquire_connection() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+
+async def fetch_one(query, params=()):
+    async with acquire_connection() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchone()
+
+
+async def fetch_rows(query, params=()):
+    """Como fetch_all, pero con tuplas: para construir registros por posición."""
+    async with acquire_connection() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+
+async def stream_all(query, params=(), batch_size=500):
+    """Recorre el resultado con un cursor del lado del servidor, sin cargarlo completo en memoria."""
+    async with acquire_connection() as connection:
+        async with connection.cursor(aiomysql.SSDictCursor) as cursor:
+            await cursor.execute(query, params)
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
+
+async def execute(query, params=()):
+    """Ejecuta una sentencia de escritura y devuelve (rowcount, lastrowid)."""
+    async with acquire_connection() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            return cursor.rowcount, cursor.lastrowid
+
+
+def get_async_pool_stats():
+    if _pool is None:
+        return {"size": POOL_SIZE, "created": 0, "in_use": 0, "idle": 0}
+    return {
+        "size": _pool.maxsize,
+        "created": _pool.size,
+        "in_use": _pool.size - _pool.freesize,
+        "idle": _pool.freesize,
+    }
@@ -1,16 +1,27 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from fastapi import HTTPException, Depends
+import os
+import time
+from typing import Optional
+from fastapi import HTTPException, Depends, Query
 from fastapi.security import OAuth2PasswordBearer
 from database import create_connection, close_connection
+from cache import TTLCache
 
 # Configuración
 SECRET_KEY = "secret-key-123"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Cache de usuarios autenticados (por código de usuario)
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "2048"))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
 # Esquema OAuth2 para extracción del token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# EventSource no permite cabeceras: en los canales de eventos el token también puede ir en la URL
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 # Función para verificar las contraseñas (sin cifrado)
 def verify_password(plain_password, hashed_password):
@@ -37,19 +48,45 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         user_code: str = payload.get("sub")
         if user_code is None:
             raise HTTPException(status_code=401, detail="No autenticado")
+
+        user = user_cache.get(user_code)
+        if user is not None:
+            return dict(user)
         
         connection = create_connection()
         if connection is None:
             raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
         
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE code = %s", (user_code,))
-        user = cursor.fetchone()
-        
-        close_connection(connection)
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM users WHERE code = %s", (user_code,))
+            user = cursor.fetchone()
+        finally:
+            close_connection(connection)
         
         if user is None:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+        # La entrada nunca sobrevive al token que la generó
+        expires_in = payload["exp"] - time.time() if payload.get("exp") else USER_CACHE_TTL
+        user_cache.set(user_code, user, ttl=expires_in)
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido o expirado")
+
+# Usuario actual a partir de la cabecera Authorization o del parámetro access_token
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None)
+):
+    token = token or access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    return get_current_user(token)
+
+# Función para invalidar el usuario en cache tras modificarlo
+def invalidate_user(user_code: str):
+    user_cache.invalidate(user_code)
+
+def get_user_cache_stats():
+    return user_cache.stats()
@@ -0,0 +1,189 @@
+"""Ejecuta una mezcla realista de peticiones contra main.app y reporta latencias.
+
+La aplicación se ejecuta en el mismo proceso (httpx + ASGITransport), contra la base
+configurada por DB_HOST/DB_NAME (ver bench/seed.py). ASGITransport no envía los eventos
+de lifespan, así que el arranque y el cierre de la aplicación se ejecutan aquí. Los resultados se guardan en JSON
+para comparar corridas entre commits.
+
+Uso (desde app/api):
+    python -m bench.run --requests 5000 --concurrency 32 --output bench-results.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+from bench.seed import BENCH_PASSWORD, PRODUCTION_HOST, employee_code
+from database import DB_CONFIG
+from metrics import QUERY_LATENCY
+import main
+
+# (nombre, peso) de cada tipo de petición en la mezcla
+REQUEST_MIX = [
+    ("login", 5),
+    ("solicitudes", 30),
+    ("requests", 20),
+    ("historical_records", 15),
+    ("excel", 2),
+    ("permit_request", 8),
+]
+
+# PDF mínimo para las subidas de archivos
+SAMPLE_PDF = b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n" + b"0" * 64 * 1024
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Worker:
+    def __init__(self, client, employees, rng):
+        self.client = client
+        self.employees = employees
+        self.rng = rng
+        self.tokens = {}
+
+    async def _token(self, code):
+        token = self.tokens.get(code)
+        if token is None:
+            response = await self.client.post("/auth/login", json={"code": code, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            token = self.tokens[code] = response.json()["access_token"]
+        return token
+
+    async def run(self, kind):
+        code = employee_code(self.rng.randrange(self.employees))
+        if kind == "login":
+            return await self.client.post("/auth/login", json={"code": code, "password": BENCH_PASSWORD})
+        if kind == "requests":
+            return await self.client.get("/requests", params={"limit": 100})
+        if kind == "historical_records":
+            return await self.client.get("/historical-records")
+        if kind == "excel":
+            return await self.client.get("/excel")
+
+        headers = {"Authorization": f"Bearer {await self._token(code)}"}
+        if kind == "solicitudes":
+            return await self.client.get("/solicitudes", headers=headers)
+        if kind == "permit_request":
+            return await self.client.post(
+                "/permit-request",
+                headers=headers,
+                data={
+                    "code": code,
+                    "name": "Benchmark",
+                    "phone": "3000000000",
+                    "dates": json.dumps([datetime.now().strftime("%Y-%m-%d")]),
+                    "noveltyType": "cita",
+                    "description": "Solicitud de benchmark",
+                },
+                files=[("files", ("soporte.pdf", SAMPLE_PDF, "application/pdf"))],
+            )
+        raise ValueError(kind)
+
+
+async def run_benchmark(total, concurrency, employees, seed):
+    rng = random.Random(seed)
+    kinds = [name for name, _ in REQUEST_MIX]
+    weights = [weight for _, weight in REQUEST_MIX]
+    plan = rng.choices(kinds, weights=weights, k=total)
+    results = {kind: {"latencies": [], "errors": 0} for kind in kinds}
+    queue = asyncio.Queue()
+    for kind in plan:
+        queue.put_nowait(kind)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def worker(worker_seed):
+            w = Worker(client, employees, random.Random(worker_seed))
+            while not queue.empty():
+                kind = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await w.run(kind)
+                    ok = response.status_code < 400
+                except Exception:
+                    ok = False
+                results[kind]["latencies"].append(time.perf_counter() - started)
+                if not ok:
+                    results[kind]["errors"] += 1
+
+        queries_before = QUERY_LATENCY.total_count()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(seed + i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        queries = QUERY_LATENCY.total_count() - queries_before
+
+    summary = {}
+    for kind, data in results.items():
+        latencies = data["latencies"]
+        summary[kind] = {
+            "count": len(latencies),
+            "errors": data["errors"],
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        }
+    all_latencies = [latency for data in results.values() for latency in data["latencies"]]
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(all_latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(all_latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(all_latencies, 99) * 1000, 2),
+        "db_queries": queries,
+        "db_queries_per_request": round(queries / total, 2) if total else 0.0,
+        "endpoints": summary,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def main_cli(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--employees", type=int, default=10000, help="Debe coincidir con bench/seed.py")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench-results.json")
+    args = parser.parse_args(argv)
+
+    if DB_CONFIG["host"] == PRODUCTION_HOST:
+        print("Se negó la ejecución: configure DB_HOST/DB_NAME para una base local de benchmark")
+        return 1
+
+    report = asyncio.run(run_benchmark(args.requests, args.concurrency, args.employees, args.seed))
+    report["commit"] = _git_commit()
+    report["timestamp"] = datetime.now().isoformat()
+
+    print(f"{'endpoint':<20}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, data in report["endpoints"].items():
+        print(f"{kind:<20}{data['count']:>8}{data['errors']:>8}{data['p50_ms']:>10}{data['p95_ms']:>10}{data['p99_ms']:>10}")
+    print(f"throughput: {report['throughput_rps']} req/s, p99: {report['p99_ms']} ms, "
+          f"consultas SQL: {report['db_queries']} ({report['db_queries_per_request']} por petición)")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli(sys.argv[1:]))
@@ -0,0 +1,156 @@
+"""Carga datos sintéticos en una base MySQL local para los benchmarks.
+
+Uso (desde app/api):
+    DB_HOST=127.0.0.1 DB_PORT=3306 DB_USER=root DB_PASSWORD=bench DB_NAME=permisos_bench \
+        python -m bench.seed --employees 10000 --permits 1000000 --equipment 100000
+"""
+import argparse
+import random
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+
+from database import DB_CONFIG, create_connection, close_connection
+from migrate import migrate
+from rollups import rebuild_rollup
+
+PRODUCTION_HOST = "junction.proxy.rlwy.net"
+BENCH_PASSWORD = "bench"
+
+NOVELTY_TYPES = ["cita", "audiencia", "licencia", "descanso", "calamidad", "diligencia", "turno_pareja"]
+EQUIPMENT_TYPES = ["cambio_turno", "postulacion", "tabla_turno", "dia_descanso"]
+ZONES = ["Centro", "Norte", "Sur", "Oriente", "Occidente"]
+SHIFTS = ["AM", "PM", "Completo"]
+STATUSES = ["pending", "approved", "approved", "rejected"]
+
+
+def employee_code(i):
+    return f"{100000 + i}"
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed_users(cursor, employees):
+    rows = [(employee_code(i), f"Empleado {i}", BENCH_PASSWORD, "employee", f"300{i:07d}", f"e{i}@bench.local")
+            for i in range(employees)]
+    rows.append(("admin", "Administrador", BENCH_PASSWORD, "admin", "", "admin@bench.local"))
+    for chunk in _chunks(rows, 1000):
+        cursor.executemany(
+            "INSERT INTO users (code, name, password, role, telefone, email) VALUES (%s, %s, %s, %s, %s, %s)",
+            chunk
+        )
+
+
+def seed_permits(connection, cursor, employees, permits, days_back, rng):
+    today = date.today()
+    batch = 5000
+    for start in range(0, permits, batch):
+        rows, days = [], []
+        batch_id = uuid.uuid4().hex
+        for _ in range(min(batch, permits - start)):
+            i = rng.randrange(employees)
+            created = datetime.combine(today - timedelta(days=rng.randrange(days_back)), datetime.min.time()) \
+                + timedelta(seconds=rng.randrange(86400))
+            first_day = created.date() + timedelta(days=rng.randrange(1, 14))
+            requested = [first_day + timedelta(days=d) for d in range(rng.choice([1, 1, 1, 2, 3]))]
+            rows.append((
+                employee_code(i), f"Empleado {i}", f"300{i:07d}", ",".join(d.isoformat() for d in requested),
+                "", rng.choice(NOVELTY_TYPES), "Solicitud sintética", created, rng.choice(STATUSES), "", "0",
+                batch_id
+            ))
+            days.append((employee_code(i), requested))
+        cursor.executemany("""
+            INSERT INTO permit_perms
+            (code, name, telefono, fecha, hora, tipo_novedad, description, time_created, solicitud, respuesta,
+             notifications, batch_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        # Con innodb_autoinc_lock_mode=2 los ids no tienen por qué ser consecutivos a partir de
+        # lastrowid; se leen por batch_id (crecen en el orden de las filas, como en /new-permit-request/batch)
+        cursor.execute("SELECT id FROM permit_perms WHERE batch_id = %s ORDER BY id", (batch_id,))
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.executemany(
+            "INSERT INTO permit_days (permit_id, code, day) VALUES (%s, %s, %s)",
+            [(permit_id, code, day) for permit_id, (code, requested) in zip(ids, days) for day in requested]
+        )
+        connection.commit()
+        print(f"  permisos: {start + len(rows)}/{permits}")
+
+
+def seed_equipment(connection, cursor, employees, equipment, days_back, rng):
+    today = date.today()
+    for start in range(0, equipment, 5000):
+        rows = []
+        for _ in range(min(5000, equipment - start)):
+            i = rng.randrange(employees)
+            created = datetime.combine(today - timedelta(days=rng.randrange(days_back)), datetime.min.time()) \
+                + timedelta(seconds=rng.randrange(86400))
+            rows.append((
+                employee_code(i), f"Empleado {i}", rng.choice(EQUIPMENT_TYPES), "Solicitud sintética",
+                rng.choice(ZONES), f"{rng.randrange(1000)}", f"{rng.randrange(1000)}", rng.choice(SHIFTS),
+                created, rng.choice(STATUSES), "", "0"
+            ))
+        cursor.executemany("""
+            INSERT INTO permit_post
+            (code, name, tipo_novedad, description, zona, comp_am, comp_pm, turno, time_created, solicitud, respuesta, notifications)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        connection.commit()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--permits", type=int, default=1000000)
+    parser.add_argument("--equipment", type=int, default=100000)
+    parser.add_argument("--days-back", type=int, default=3 * 365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if DB_CONFIG["host"] == PRODUCTION_HOST:
+        print("Se negó la carga: configure DB_HOST/DB_NAME para una base local de benchmark")
+        return 1
+
+    connection = create_connection()
+    if connection is None:
+        print("Error de conexión a la base de datos")
+        return 1
+    rng = random.Random(args.seed)
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                code VARCHAR(50) NOT NULL UNIQUE,
+                name VARCHAR(100) NOT NULL,
+                password VARCHAR(255) NOT NULL,
+                role ENUM('employee', 'admin') NOT NULL DEFAULT 'employee',
+                telefone VARCHAR(50),
+                email VARCHAR(255)
+            )
+        """)
+        migrate(connection)
+        for table in ("permit_days", "permit_perms", "permit_post", "users"):
+            cursor.execute(f"DELETE FROM {table}")
+        connection.commit()
+
+        print(f"Usuarios: {args.employees}")
+        seed_users(cursor, args.employees)
+        connection.commit()
+        print(f"Permisos: {args.permits}")
+        seed_permits(connection, cursor, args.employees, args.permits, args.days_back, rng)
+        print(f"Solicitudes de equipo: {args.equipment}")
+        seed_equipment(connection, cursor, args.employees, args.equipment, args.days_back, rng)
+        print("Reconstruyendo agregado semanal")
+        rebuild_rollup(connection)
+    finally:
+        close_connection(connection)
+    print("Datos de benchmark cargados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+"""Actualizaciones por lotes sobre permit_perms / permit_post en una sola transacción."""
+from rollups import REQUEST_TABLES, refresh_statements, week_start_of
+
+BULK_CHUNK_SIZE = 500
+
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _placeholders(count):
+    return ", ".join(["%s"] * count)
+
+
+async def lock_rows(cursor, table, ids):
+    """Bloquea las filas existentes y devuelve {id: (code, time_created)}."""
+    found = {}
+    for chunk in _chunks(ids):
+        await cursor.execute(
+            f"SELECT id, code, time_created FROM {table} WHERE id IN ({_placeholders(len(chunk))}) FOR UPDATE",
+            chunk
+        )
+        for request_id, code, created_at in await cursor.fetchall():
+            found[request_id] = (code, created_at)
+    return found
+
+
+async def bulk_update(cursor, table, columns, rows):
+    """Aplica {columna: valor} distintos por id con un UPDATE ... CASE por cada bloque.
+
+    rows es una lista de (id, {columna: valor}).
+    """
+    for chunk in _chunks(rows):
+        sets, params = [], []
+        for column in columns:
+            sets.append(f"{column} = CASE id {' '.join(['WHEN %s THEN %s'] * len(chunk))} END")
+            for request_id, values in chunk:
+                params.extend((request_id, values[column]))
+        ids = [request_id for request_id, _ in chunk]
+        await cursor.execute(
+            f"UPDATE {table} SET {', '.join(sets)} WHERE id IN ({_placeholders(len(ids))})",
+            params + ids
+        )
+
+
+async def apply_bulk(connection, items, columns, refresh_rollup=False):
+    """Actualiza los items agrupados por tipo y devuelve el resultado de cada uno.
+
+    items: lista de (kind, id, {columna: valor}); si un id se repite gana el último.
+    Cada resultado incluye el código del empleado dueño de la solicitud.
+    """
+    by_kind = {}
+    for kind, request_id, values in items:
+        by_kind.setdefault(kind, {})[request_id] = values
+
+    results = {}
+    async with connection.cursor() as cursor:
+        await connection.begin()
+        try:
+            slices = set()
+            for kind, values_by_id in by_kind.items():
+                table = REQUEST_TABLES[kind]
+                found = await lock_rows(cursor, table, list(values_by_id))
+                await bulk_update(cursor, table, columns,
+                                  [(request_id, values) for request_id, values in values_by_id.items()
+                                   if request_id in found])
+                for request_id in values_by_id:
+                    owner = found.get(request_id)
+                    results[(kind, request_id)] = owner[0] if owner else None
+                for code, created_at in found.values():
+                    slices.add((kind, code, week_start_of(created_at)))
+
+            if refresh_rollup:
+                for kind, code, week_start in slices:
+                    for query, params in refresh_statements(kind, code, week_start):
+                        await cursor.execute(query, params)
+            await connection.commit()
+        except Exception:
+            await connection.rollback()
+            raise
+
+    return [{"id": request_id, "kind": kind, "code": results[(kind, request_id)],
+             "result": "updated" if results[(kind, request_id)] is not None else "not_found"}
+            for kind, request_id, _ in items]
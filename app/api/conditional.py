@@ -0,0 +1,39 @@
+"""ETag de las vistas por empleado a partir de una marca de agua barata.
+
+En lugar de ejecutar las consultas completas, se cuentan las solicitudes del empleado y
+se toma su última modificación (índices (code, updated_at)); si nada cambió, el cliente
+recibe 304 sin cuerpo.
+"""
+import hashlib
+from fastapi import Request, Response
+from file_serving import etag_matches
+
+# Cambiar al modificar el formato de las respuestas, para invalidar los ETag ya emitidos
+RESPONSE_VERSION = 1
+
+CACHE_CONTROL = "private, no-cache"
+
+WATERMARK_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM permit_perms WHERE code = %s),
+        (SELECT MAX(updated_at) FROM permit_perms WHERE code = %s),
+        (SELECT COUNT(*) FROM permit_post WHERE code = %s),
+        (SELECT MAX(updated_at) FROM permit_post WHERE code = %s)
+"""
+
+
+def watermark_params(code):
+    return (code, code, code, code)
+
+
+def watermark_etag(view, code, watermark):
+    values = tuple(watermark.values()) if isinstance(watermark, dict) else tuple(watermark)
+    digest = hashlib.sha1(repr((RESPONSE_VERSION, view, code, values)).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def not_modified(request: Request, etag):
+    """Respuesta 304 si el cliente ya tiene esta versión, None en caso contrario."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
@@ -0,0 +1,115 @@
+"""Cobertura de personal: ausencias por día, zona/turno y tipo de novedad en un rango.
+
+Los días ya vienen expandidos en permit_days, así que el conteo se hace en SQL con un
+GROUP BY sobre el índice (day, code). La zona y el turno de cada empleado se toman de
+su solicitud de equipo más reciente en permit_post. Los resultados se guardan por rango
+y se descartan cuando alguna escritura cambia permisos o solicitudes de equipo; entre
+workers, la antigüedad máxima es COVERAGE_CACHE_TTL.
+"""
+import os
+import threading
+from cache import TTLCache
+
+COVERAGE_CACHE_TTL = int(os.getenv("COVERAGE_CACHE_TTL", "300"))
+MAX_COVERAGE_DAYS = 400
+
+GROUP_COLUMNS = {"zona": "COALESCE(z.zona, '')", "turno": "COALESCE(z.turno, '')"}
+
+# Zona y turno vigentes de cada empleado: su solicitud de equipo más reciente
+_LATEST_ASSIGNMENT = """
+    SELECT code, zona, turno
+    FROM (
+        SELECT code, zona, turno,
+               ROW_NUMBER() OVER (PARTITION BY code ORDER BY time_created DESC, id DESC) AS rn
+        FROM permit_post
+    ) ranked
+    WHERE rn = 1
+"""
+
+_COUNTS = """
+    COUNT(DISTINCT CASE WHEN p.solicitud = 'approved' THEN d.code END) AS approved,
+    COUNT(DISTINCT CASE WHEN p.solicitud != 'approved' THEN d.code END) AS pending
+"""
+
+_cache = TTLCache(maxsize=256, ttl=COVERAGE_CACHE_TTL)
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def invalidate_coverage():
+    """Llamar tras cualquier escritura que cambie permisos, su estado o la zona/turno."""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        _cache.clear()
+
+
+def get_coverage_cache_stats():
+    return _cache.stats()
+
+
+def coverage_statements(date_from, date_to, group_by):
+    # Alias distintos de las columnas: en GROUP BY MySQL resuelve antes las columnas de las tablas
+    groups = ",\n            ".join(f"{GROUP_COLUMNS[g]} AS {g}_group" for g in group_by)
+    group_names = ", ".join(f"{g}_group" for g in group_by)
+    joins = f"""
+        FROM permit_days d
+        JOIN permit_perms p ON p.id = d.permit_id
+        LEFT JOIN ({_LATEST_ASSIGNMENT}) z ON z.code = d.code
+        WHERE d.day BETWEEN %s AND %s
+            AND p.solicitud != 'rejected'
+    """
+    cells = f"""
+        SELECT
+            d.day,
+            {groups},
+            COALESCE(p.tipo_novedad, '') AS novedad,
+            {_COUNTS}
+        {joins}
+        GROUP BY d.day, {group_names}, novedad
+        ORDER BY d.day, {group_names}, novedad
+    """
+    # Los totales por día cuentan empleados distintos (no la suma de celdas)
+    totals = f"""
+        SELECT d.day, {_COUNTS}
+        FROM permit_days d
+        JOIN permit_perms p ON p.id = d.permit_id
+        WHERE d.day BETWEEN %s AND %s
+            AND p.solicitud != 'rejected'
+        GROUP BY d.day
+        ORDER BY d.day
+    """
+    return (cells, (date_from, date_to)), (totals, (date_from, date_to))
+
+
+async def compute_coverage(connection, date_from, date_to, group_by):
+    key = (date_from, date_to, tuple(group_by))
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    generation = _generation
+    (cells_query, cells_params), (totals_query, totals_params) = coverage_statements(date_from, date_to, group_by)
+    async with connection.cursor() as cursor:
+        await cursor.execute(cells_query, cells_params)
+        cells = await cursor.fetchall()
+        await cursor.execute(totals_query, totals_params)
+        totals = await cursor.fetchall()
+
+    result = {
+        "date_from": str(date_from),
+        "date_to": str(date_to),
+        "group_by": list(group_by),
+        "cells": [
+            dict(zip(["day", *group_by, "novedad", "approved", "pending"], (str(row[0]), *row[1:])))
+            for row in cells
+        ],
+        "totals": [
+            {"day": str(day), "approved": approved, "pending": pending}
+            for day, approved, pending in totals
+        ],
+    }
+    # Si hubo una escritura mientras se calculaba, el resultado puede estar desactualizado
+    if generation == _generation:
+        _cache.set(key, result)
+    return result
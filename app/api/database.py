@@ -1,20 +1,200 @@
+import os
+import threading
+import time
 import mysql.connector
 from mysql.connector import Error
+from sqlalchemy.orm import declarative_base
+from metrics import observe_acquire, observe_query
+
+# Configuración de la base de datos (se puede sobrescribir con variables de entorno)
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "junction.proxy.rlwy.net"),
+    "port": int(os.getenv("DB_PORT", "48135")),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "UfuGUdsigwumXMGkwuabYQHYPjQzWAZs"),
+    "database": os.getenv("DB_NAME", "railway"),
+}
+
+# Base declarativa para los modelos de models.py
+Base = declarative_base()
+
+# Configuración del pool de conexiones
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Solo se hace ping a conexiones que llevan más de estos segundos inactivas
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+
+
+class TimedCursor:
+    """Cursor que mide cada sentencia ejecutada; el resto se delega al cursor real."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _timed(self, method, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = method(query, *args, **kwargs)
+        except Exception:
+            observe_query(query, time.perf_counter() - started, failed=True)
+            raise
+        observe_query(query, time.perf_counter() - started)
+        return result
+
+    def execute(self, query, *args, **kwargs):
+        return self._timed(self._cursor.execute, query, *args, **kwargs)
+
+    def executemany(self, query, *args):
+        return self._timed(self._cursor.executemany, query, *args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Conexión cuyos cursores miden las sentencias; el resto se delega a la conexión real."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones MySQL con verificación de salud y estadísticas."""
+
+    def __init__(self, size, timeout, ping_after, **config):
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.config = config
+        self._idle = []  # lista de (conexión, instante en que quedó libre)
+        self._leased = set()
+        self._created = 0
+        self._cond = threading.Condition()
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        return InstrumentedConnection(mysql.connector.connect(**self.config))
+
+    def _is_healthy(self, connection, idle_since):
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    connection, idle_since = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise Error(msg="Tiempo de espera agotado al obtener una conexión del pool")
+                self._cond.wait(remaining)
+            waited = time.monotonic() - started
+            self._waits += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+        observe_acquire("sync", waited)
+
+        # La conexión (o el ping) se hace fuera del lock para no bloquear al resto
+        try:
+            if connection is not None and not self._is_healthy(connection, idle_since):
+                self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._leased.add(id(connection))
+        return connection
+
+    def release(self, connection):
+        with self._cond:
+            if id(connection) not in self._leased:
+                return False
+            self._leased.discard(id(connection))
+
+        # Restablecer el estado de la sesión antes de devolverla al pool
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            connection.reset_session()
+        except Exception:
+            self._discard(connection)
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            return True
+
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+        return True
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": len(self._leased),
+                "idle": len(self._idle),
+                "acquired": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total": round(self._wait_time_total, 6),
+                "wait_time_avg": round(self._wait_time_total / self._waits, 6) if self._waits else 0.0,
+                "wait_time_max": round(self._wait_time_max, 6),
+            }
+
+
+pool = ConnectionPool(POOL_SIZE, POOL_TIMEOUT, POOL_PING_AFTER, **DB_CONFIG)
+
 
 def create_connection():
     try:
-        connection = mysql.connector.connect(
-            host="junction.proxy.rlwy.net",
-            port=48135,
-            user="root",
-            password="UfuGUdsigwumXMGkwuabYQHYPjQzWAZs",
-            database="railway"
-        )
-        return connection
+        return pool.acquire()
     except Error as e:
         print(f"Error connecting to MySQL Database: {e}")
         return None
 
 def close_connection(connection):
-    if connection:
+    if connection and not pool.release(connection):
+        # Conexión que no pertenece al pool
         connection.close()
+
+def get_pool_stats():
+    return pool.stats()
@@ -0,0 +1,138 @@
+"""Directorio de empleados en memoria para listados, búsqueda y consultas por código.
+
+Se carga completo la primera vez y después se mantiene por diferencias: las escrituras
+de este proceso lo actualizan al momento y, cada DIRECTORY_CHECK_SECONDS, una consulta
+barata (conteo y MAX(updated_at)) detecta cambios hechos por otros workers. Si cambió el
+número de usuarios se recarga completo; si no, solo se leen las filas modificadas.
+"""
+import asyncio
+import bisect
+import os
+import time
+import unicodedata
+from async_database import fetch_all, fetch_one
+
+DIRECTORY_CHECK_SECONDS = float(os.getenv("DIRECTORY_CHECK_SECONDS", "5"))
+
+USER_COLUMNS = "*"
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def fold(text):
+    """Minúsculas y sin tildes, para buscar 'jose' y encontrar 'José'."""
+    text = unicodedata.normalize("NFKD", str(text or "")).lower()
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+class EmployeeDirectory:
+    def __init__(self):
+        self._by_code = {}
+        self._codes = []          # todos los códigos ordenados
+        self._by_role = {}        # rol -> códigos ordenados
+        self._tokens = []         # (token, código) ordenado, para búsqueda por prefijo
+        self._search_text = {}    # código -> "código nombre" normalizado, para subcadenas
+        self._dirty = True
+        self._loaded = False
+        self._watermark = None    # (conteo, MAX(updated_at)) de la última sincronización
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    # --- Sincronización con la base de datos ---
+
+    async def ensure_fresh(self):
+        if self._loaded and time.monotonic() - self._checked_at < DIRECTORY_CHECK_SECONDS:
+            return
+        async with self._lock:
+            if self._loaded and time.monotonic() - self._checked_at < DIRECTORY_CHECK_SECONDS:
+                return
+            watermark = await fetch_one("SELECT COUNT(*) AS total, MAX(updated_at) AS updated_at FROM users")
+            watermark = (watermark["total"], watermark["updated_at"])
+            if not self._loaded or watermark[0] != len(self._by_code):
+                await self._reload()
+            elif watermark != self._watermark and self._watermark[1] is not None:
+                # >= porque varias filas pueden compartir la misma marca; reaplicarlas es inocuo
+                for row in await fetch_all(f"SELECT {USER_COLUMNS} FROM users WHERE updated_at >= %s",
+                                           (self._watermark[1],)):
+                    self._put(row)
+            self._watermark = watermark
+            self._checked_at = time.monotonic()
+
+    async def _reload(self):
+        rows = await fetch_all(f"SELECT {USER_COLUMNS} FROM users")
+        self._by_code = {row["code"]: row for row in rows}
+        self._dirty = True
+        self._loaded = True
+
+    def _put(self, row):
+        self._by_code[row["code"]] = row
+        self._dirty = True
+
+    async def refresh_user(self, code):
+        """Relee un usuario tras escribirlo en este proceso (o lo quita si ya no existe)."""
+        row = await fetch_one(f"SELECT {USER_COLUMNS} FROM users WHERE code = %s", (code,))
+        if row is None:
+            self.remove(code)
+        else:
+            self._put(row)
+
+    def expire(self):
+        """Fuerza la comprobación contra la base de datos en la próxima consulta."""
+        self._checked_at = 0.0
+
+    def remove(self, code):
+        if self._by_code.pop(code, None) is not None:
+            self._dirty = True
+
+    # --- Índices ---
+
+    def _rebuild(self):
+        codes = sorted(self._by_code)
+        by_role, tokens, search_text = {}, [], {}
+        for code in codes:
+            row = self._by_code[code]
+            by_role.setdefault(row.get("role"), []).append(code)
+            name = fold(row.get("name"))
+            search_text[code] = f"{fold(code)} {name}"
+            tokens.append((fold(code), code))
+            tokens.extend((word, code) for word in set(name.split()))
+        tokens.sort()
+        self._codes, self._by_role, self._tokens, self._search_text = codes, by_role, tokens, search_text
+        self._dirty = False
+
+    def _prefix_matches(self, token):
+        # Todas las palabras que empiezan por token quedan entre token y token + el mayor carácter
+        start = bisect.bisect_left(self._tokens, (token,))
+        end = bisect.bisect_left(self._tokens, (token + _MAX_CHAR,), start)
+        return {code for _, code in self._tokens[start:end]}
+
+    # --- Consultas ---
+
+    def get(self, code):
+        return self._by_code.get(code)
+
+    def search(self, query=None, role=None, offset=0, limit=None):
+        """Devuelve (total, filas) ordenadas por código.
+
+        Con query, primero van los usuarios cuyo código o alguna palabra del nombre empieza
+        por cada término y después los que solo los contienen como subcadena.
+        """
+        if self._dirty:
+            self._rebuild()
+        codes = self._by_role.get(role, []) if role else self._codes
+
+        terms = fold(query).split() if query else []
+        if terms:
+            allowed = set(codes)
+            prefixed = set.intersection(*(self._prefix_matches(term) for term in terms)) & allowed
+            contained = [code for code in codes if code not in prefixed
+                         and all(term in self._search_text[code] for term in terms)]
+            codes = sorted(prefixed) + contained
+
+        page = codes[offset:offset + limit] if limit is not None else codes[offset:]
+        return len(codes), [self._by_code[code] for code in page]
+
+    def stats(self):
+        return {"users": len(self._by_code), "tokens": len(self._tokens), "loaded": self._loaded}
+
+
+directory = EmployeeDirectory()
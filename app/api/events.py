@@ -0,0 +1,157 @@
+"""Canal de eventos en tiempo real (Server-Sent Events) sobre un pub/sub en proceso.
+
+Los empleados reciben en el canal "user:<código>" los cambios de sus solicitudes y los
+administradores reciben en "admins" las solicitudes nuevas. Con un solo worker basta el
+backend en memoria; con varios, EVENTS_BACKEND=redis (requiere el paquete redis) reparte
+los eventos entre procesos.
+"""
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_CHANNEL_PREFIX = "permisos:events:"
+
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+
+ADMIN_CHANNEL = "admins"
+
+
+def user_channel(code):
+    return f"user:{code}"
+
+
+class InProcessBroker:
+    """Reparte cada evento a las colas de los suscriptores del canal dentro de este proceso."""
+
+    def __init__(self):
+        self._subscribers = {}  # canal -> conjunto de colas
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def publish(self, channel, event):
+        self._deliver(channel, event)
+
+    def _deliver(self, channel, event):
+        for queue in list(self._subscribers.get(channel, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Un cliente lento no debe frenar al resto; recuperará el estado al reconectar
+                logger.warning(f"Cola llena en el canal {channel}, se descarta el evento")
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            for channel in channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(queue)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+class RedisBroker(InProcessBroker):
+    """Publica en Redis; cada worker escucha todos los canales y entrega a sus suscriptores locales."""
+
+    def __init__(self, url):
+        super().__init__()
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._listener = None
+
+    async def start(self):
+        pubsub = self._redis.pubsub()
+        await pubsub.psubscribe(REDIS_CHANNEL_PREFIX + "*")
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        async for message in pubsub.listen():
+            if message["type"] != "pmessage":
+                continue
+            channel = message["channel"].decode()[len(REDIS_CHANNEL_PREFIX):]
+            self._deliver(channel, json.loads(message["data"]))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        await self._redis.close()
+
+    async def publish(self, channel, event):
+        await self._redis.publish(REDIS_CHANNEL_PREFIX + channel, json.dumps(event, default=str))
+
+
+broker = RedisBroker(REDIS_URL) if EVENTS_BACKEND == "redis" else InProcessBroker()
+
+_loop = None
+_pending = set()  # referencias a las publicaciones en curso para que no se recolecten
+
+
+async def start_broker():
+    global _loop
+    _loop = asyncio.get_running_loop()
+    await broker.start()
+
+
+async def close_broker():
+    await broker.close()
+
+
+def _log_failure(future):
+    _pending.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"No se pudo publicar el evento: {future.exception()}")
+
+
+def notify(channel, event_type, data):
+    """Publica un evento sin esperar; se puede llamar desde el loop o desde el pool de hilos."""
+    event = {"type": event_type, "data": data}
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        if _loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(broker.publish(channel, event), _loop)
+    else:
+        future = asyncio.ensure_future(broker.publish(channel, event))
+    _pending.add(future)
+    future.add_done_callback(_log_failure)
+
+
+def format_event(event):
+    payload = json.dumps(event["data"], default=str)
+    return f"event: {event['type']}\ndata: {payload}\n\n"
+
+
+async def event_stream(request, channels):
+    """Generador SSE: eventos de los canales indicados y un comentario periódico como latido."""
+    async with broker.subscribe(channels) as queue:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_event(event)
@@ -0,0 +1,113 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+import xlsxwriter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+# Columnas del reporte de permisos: (clave del registro, encabezado)
+PERMIT_EXPORT_COLUMNS = [
+    ("code", "Código"),
+    ("name", "Nombre"),
+    ("telefono", "Teléfono"),
+    ("fecha_inicio", "Fecha inicio"),
+    ("fecha_fin", "Fecha fin"),
+    ("novedad", "Novedad"),
+    ("description", "Descripción"),
+    ("respuesta", "Respuesta"),
+]
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def permit_summary_query(date_from=None, date_to=None, novelty_type=None, order_by_start=False):
+    """Permisos agrupados por empleado y novedad con el rango de días solicitado."""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("d.day >= %s")
+        params.append(date_from)
+    if date_to:
+        clauses.append("d.day < %s")
+        params.append(date_to + timedelta(days=1))
+    if novelty_type:
+        clauses.append("p.tipo_novedad = %s")
+        params.append(novelty_type)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = "ORDER BY MIN(d.day)" if order_by_start else ""
+    query = f"""
+        SELECT 
+            p.code,
+            p.name,
+            p.telefono,
+            MIN(d.day) AS fecha_inicio,
+            MAX(d.day) AS fecha_fin,
+            p.tipo_novedad AS novedad,
+            p.description,
+            p.respuesta
+        FROM permit_perms p
+        LEFT JOIN permit_days d ON d.permit_id = p.id
+        {where}
+        GROUP BY p.code, p.name, p.telefono, p.tipo_novedad, p.description, p.respuesta
+        {order}
+    """
+    return query, tuple(params)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+async def _csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel detecte UTF-8 al abrir el CSV
+    writer.writerow([header for _, header in columns])
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    async for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_cell(row[key]) for key, _ in columns])
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _write_xlsx(rows, columns, path):
+    # constant_memory escribe cada fila a disco en cuanto se completa
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Permisos")
+    worksheet.write_row(0, 0, [header for _, header in columns])
+    row_index = 1
+    async for row in rows:
+        worksheet.write_row(row_index, 0, [_cell(row[key]) for key, _ in columns])
+        row_index += 1
+    await run_in_threadpool(workbook.close)
+
+
+async def export_response(rows, columns, export_format, filename):
+    """Respuesta de descarga en CSV (streaming) o XLSX (archivo temporal en disco)."""
+    if export_format == "csv":
+        return StreamingResponse(
+            _csv_chunks(rows, columns),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await _write_xlsx(rows, columns, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=f"{filename}.xlsx",
+        background=BackgroundTask(os.remove, path),
+    )
@@ -0,0 +1,139 @@
+import hashlib
+import mimetypes
+import os
+import re
+import aiofiles
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from cache import TTLCache
+from uploads import UPLOAD_DIR, UPLOAD_CHUNK_SIZE, is_blob_name, resolve_file
+
+# Si se define (p. ej. "/protected-uploads/"), el envío del archivo se delega al proxy (nginx)
+X_ACCEL_REDIRECT_PREFIX = os.getenv("X_ACCEL_REDIRECT_PREFIX", "")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Los archivos antiguos pueden reemplazarse con el mismo nombre: se revalidan siempre con el ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_BYTE_RANGE = re.compile(r"(\d*)\s*-\s*(\d*)", re.ASCII)
+
+# Hash de archivos antiguos, indexado por (ruta, mtime, tamaño) para no recalcularlo
+_legacy_hashes = TTLCache(maxsize=4096, ttl=24 * 3600)
+
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def etag_for(filename, path, stat):
+    if is_blob_name(filename):
+        digest = filename.split(".")[0]
+    else:
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = _legacy_hashes.get(key)
+        if digest is None:
+            digest = await run_in_threadpool(_hash_file, path)
+            _legacy_hashes.set(key, digest)
+    return f'"{digest}"'
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def _parse_range(header, size):
+    """Devuelve (inicio, fin) inclusivo para un único rango 'bytes=', None si no aplica.
+
+    Los rangos mal formados (incluido fin < inicio) se ignoran y se sirve el archivo
+    completo. Lanza ValueError si el rango es válido pero no se puede satisfacer: inicio
+    más allá del final o sufijo de longitud cero.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    match = _BYTE_RANGE.fullmatch(header[len("bytes="):].strip())
+    if match is None:
+        return None
+    start_text, end_text = match.groups()
+    if not start_text:
+        if not end_text:
+            return None
+        suffix = int(end_text)
+        if suffix == 0 or size == 0:
+            raise ValueError("Rango no satisfacible")
+        return max(0, size - suffix), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if end < start and end_text:
+        return None
+    if start >= size:
+        raise ValueError("Rango no satisfacible")
+    return start, min(end, size - 1)
+
+
+async def _iter_range(path, start, end):
+    remaining = end - start + 1
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        while remaining > 0:
+            chunk = await f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def serve_attachment(request: Request, filename: str):
+    """Sirve un adjunto con ETag, respuestas 304, rangos de bytes y cabeceras de cache."""
+    path = resolve_file(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    stat = os.stat(path)
+    etag = await etag_for(filename, path, stat)
+    return serve_path(request, path, stat, etag, immutable=is_blob_name(filename))
+
+
+def serve_path(request: Request, path, stat, etag, immutable):
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if X_ACCEL_REDIRECT_PREFIX:
+        relative = os.path.relpath(path, UPLOAD_DIR).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = X_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative
+        return Response(headers=headers, media_type=media_type)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{stat.st_size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            if request.method == "HEAD":
+                return Response(status_code=206, headers=headers, media_type=media_type)
+            return StreamingResponse(_iter_range(path, start, end), status_code=206,
+                                     headers=headers, media_type=media_type)
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat)
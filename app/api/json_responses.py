@@ -0,0 +1,33 @@
+"""Respuesta JSON serializada en una sola pasada con orjson.
+
+orjson convierte datetime/date de forma nativa; Decimal y timedelta (columnas TIME)
+se resuelven en el default. Devolver FastJSONResponse directamente desde un endpoint
+evita además el recorrido previo de jsonable_encoder.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import orjson
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,20 +1,42 @@
-from schemas import LoginRequest, LoginResponse, UserResponse, PermitRequest, EquipmentRequest, NotificationStatusUpdate, SolicitudResponse, UpdatePhoneRequest, ApprovalUpdate, PermitRequest2, UserResponse, UserResponse
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Query, status
+from schemas import LoginRequest, LoginResponse, UserResponse, PermitRequest, EquipmentRequest, NotificationStatusUpdate, RequestStatusUpdate, SolicitudResponse, PermitListItem, EquipmentListItem, HistoricalRecord, UpdatePhoneRequest, ApprovalUpdate, PermitRequest2, UserResponse, UserResponse, BulkStatusUpdate, BulkNotificationUpdate, BulkApprovalUpdate, PermitBatchRequest
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from auth import create_access_token, verify_password, get_current_user
-from fastapi.responses import JSONResponse, FileResponse
-from database import create_connection, close_connection
+from auth import create_access_token, verify_password, get_current_user, get_stream_user, invalidate_user, get_user_cache_stats
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from database import create_connection, close_connection, get_pool_stats
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, request_filters, requests_page_statement, merge_pages
+from permit_days import parse_days, insert_permit_days
+from exports import PERMIT_EXPORT_COLUMNS, permit_summary_query, export_response
+from rollups import (REQUEST_TABLES, lookup_statement, refresh_statements, refresh_codes_statements,
+                     weekly_records_statement, week_start_of)
+from metrics import REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, render as render_metrics
+from uploads import save_uploads, insert_attachments, blob_path, is_blob_name, resolve_file
+from file_serving import serve_attachment, serve_path, etag_for
+from thumbnails import ensure_thumbnail, schedule_thumbnails, shutdown_executor
+from bulk import apply_bulk
+from coverage import MAX_COVERAGE_DAYS, GROUP_COLUMNS, compute_coverage, invalidate_coverage, get_coverage_cache_stats
+from overlaps import (DEADLOCK_DETAIL, checked_days, find_conflicts, ensure_no_conflicts, conflicting_days,
+                      within_window, crew_overlaps, is_deadlock)
+from directory import directory
+from user_import import detect_format, import_users
+from json_responses import FastJSONResponse
+from records import (PermitListRow, EquipmentListRow, SolicitudRow, HistoricalRow, from_rows,
+                     unnotified_statement, answered_statement, user_history_statement)
+from conditional import CACHE_CONTROL, WATERMARK_QUERY, watermark_params, watermark_etag, not_modified
+from events import ADMIN_CHANNEL, user_channel, notify, event_stream, start_broker, close_broker, broker
+from async_database import acquire_connection, fetch_all, fetch_one, fetch_rows, stream_all, execute as db_execute, close_pool, get_async_pool_stats
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from datetime import timedelta, datetime
-from typing import List, Optional
+from datetime import timedelta, datetime, date
+from typing import List, Literal, Optional, Union
 import logging
 import mimetypes
-import aiofiles
+import aiomysql
 import json
 import os
+import time
+import uuid
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configuración CORS
 app.add_middleware(
@@ -23,11 +45,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
@@ -44,17 +64,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_event_broker():
+    await start_broker()
+
+@app.on_event("shutdown")
+async def shutdown_db_pool():
+    await close_pool()
+    await close_broker()
+    shutdown_executor()
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    method = request.method
+    REQUESTS_IN_FLIGHT.inc(method)
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Se usa la plantilla de la ruta (/requests/{code}) para no crear una serie por valor
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.observe(time.perf_counter() - started, method, route_path)
+        REQUEST_COUNT.inc(method, route_path, str(status_code))
+        REQUESTS_IN_FLIGHT.dec(method)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    sync_pool = get_pool_stats()
+    async_pool = get_async_pool_stats()
+    user_cache = get_user_cache_stats()
+    body = render_metrics([
+        ("db_pool_in_use", "Conexiones síncronas en uso", sync_pool["in_use"]),
+        ("db_pool_idle", "Conexiones síncronas libres", sync_pool["idle"]),
+        ("db_pool_timeouts_total", "Esperas del pool síncrono que agotaron el tiempo", sync_pool["timeouts"]),
+        ("db_async_pool_in_use", "Conexiones asíncronas en uso", async_pool["in_use"]),
+        ("db_async_pool_idle", "Conexiones asíncronas libres", async_pool["idle"]),
+        ("user_cache_hits_total", "Aciertos de la cache de usuarios", user_cache["hits"]),
+        ("user_cache_misses_total", "Fallos de la cache de usuarios", user_cache["misses"]),
+        ("coverage_cache_hits_total", "Aciertos de la cache de cobertura", get_coverage_cache_stats()["hits"]),
+        ("directory_users", "Usuarios en el directorio en memoria", directory.stats()["users"]),
+        ("event_subscribers", "Clientes conectados al canal de eventos", broker.subscriber_count()),
+    ])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 @app.post("/auth/login", response_model=LoginResponse)
 def login(request: LoginRequest):
     connection = create_connection()
     if connection is None:
         raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
     
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE code = %s", (request.code,))
-    user = cursor.fetchone()
-    
-    close_connection(connection)
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM users WHERE code = %s", (request.code,))
+        user = cursor.fetchone()
+    finally:
+        close_connection(connection)
     
     if not user or not verify_password(request.password, user['password']):
         raise HTTPException(status_code=400, detail="Credenciales inválidas")
@@ -83,6 +151,7 @@ def update_phone(request: UpdatePhoneRequest, current_user: dict = Depends(get_c
             WHERE code = %s
         """, (request.phone, current_user['code']))
         connection.commit()
+        invalidate_user(current_user['code'])
         
     except Exception as e:
         connection.rollback()
@@ -112,180 +181,321 @@ async def create_permit_request(
     logger.debug(f"Request data: code={code}, name={name}, phone={phone}, dates={dates}, noveltyType={noveltyType}, time={time}, description={description}")
     logger.debug(f"Number of files received: {len(files)}")
 
-    connection = create_connection()
-    if connection is None:
-        logger.error("Failed to create database connection")
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-
-    cursor = connection.cursor()
     saved_files = []
 
     try:
-        # Handle file uploads first
+        # Handle file uploads first: streamed to the content-addressed store, validated by content, in parallel
+        stored_files = []
         if files:
-            for file in files:
-                logger.info(f"Processing file: {file.filename}")
-                # Validate file type
-                content_type = file.content_type
-                if content_type not in ['image/jpeg', 'image/png', 'application/pdf']:
-                    logger.warning(f"Invalid file type: {content_type}")
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Tipo de archivo no permitido: {content_type}"
-                    )
-                
-                # Use original filename
-                original_filename = file.filename
-                file_path = os.path.join(UPLOAD_DIR, original_filename)
-                
-                # Handle filename conflicts
-                counter = 1
-                while os.path.exists(file_path):
-                    name, ext = os.path.splitext(original_filename)
-                    new_filename = f"{name}_{counter}{ext}"
-                    file_path = os.path.join(UPLOAD_DIR, new_filename)
-                    counter += 1
-                
-                # Save file
-                try:
-                    async with aiofiles.open(file_path, 'wb') as buffer:
-                        content = await file.read()
-                        await buffer.write(content)
-                    
-                    saved_files.append({
-                        "fileName": os.path.basename(file_path),
-                        "fileUrl": os.path.basename(file_path)
-                    })
-                    logger.info(f"File saved: {file_path}")
-                except Exception as e:
-                    logger.error(f"Error saving file: {str(e)}")
-                    # Clean up any files that were saved before the error
-                    for saved_file in saved_files:
-                        try:
-                            os.remove(os.path.join(UPLOAD_DIR, saved_file['fileUrl']))
-                        except Exception as cleanup_error:
-                            logger.error(f"Error cleaning up file: {str(cleanup_error)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail="Error al guardar el archivo"
-                    )
+            try:
+                stored_files = await save_uploads(files)
+            except HTTPException as e:
+                logger.warning(f"Rejected upload: {e.detail}")
+                raise
+            except Exception as e:
+                logger.error(f"Error saving file: {str(e)}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Error al guardar el archivo"
+                )
+            for stored in stored_files:
+                saved_files.append({
+                    "fileName": stored["fileName"],
+                    "fileUrl": stored["blob"]
+                })
+                logger.info(f"File saved: {stored['blob']} ({stored['fileName']})")
 
         # Parse dates from JSON string
         try:
             dates_list = json.loads(dates)
+            permit_days = parse_days(dates_list)
             logger.debug(f"Parsed dates: {dates_list}")
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
             logger.error(f"Error parsing dates JSON: {str(e)}")
             raise HTTPException(status_code=400, detail="Invalid date format")
         
         # Insert into database
         try:
-            cursor.execute("""
-                INSERT INTO permit_perms 
-                (code, name, telefono, fecha, hora, tipo_novedad, description, files, file_name, file_url)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                current_user['code'],
-                current_user['name'],
-                phone,
-                ','.join(dates_list),
-                time or '',
-                noveltyType,
-                description,
-                json.dumps([f['fileName'] for f in saved_files]) if saved_files else None,
-                json.dumps([f['fileName'] for f in saved_files]) if saved_files else None,
-                json.dumps([f['fileName'] for f in saved_files]) if saved_files else None
-            ))
-            connection.commit()
+            # files/file_url guardan el nombre del blob; file_name el nombre original
+            blobs_json = json.dumps([f['fileUrl'] for f in saved_files]) if saved_files else None
+            names_json = json.dumps([f['fileName'] for f in saved_files]) if saved_files else None
+            async with acquire_connection() as connection:
+                async with connection.cursor() as cursor:
+                    await connection.begin()
+                    await ensure_no_conflicts(cursor, current_user['code'], permit_days)
+                    await cursor.execute("""
+                        INSERT INTO permit_perms 
+                        (code, name, telefono, fecha, hora, tipo_novedad, description, files, file_name, file_url)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        current_user['code'],
+                        current_user['name'],
+                        phone,
+                        ','.join(dates_list),
+                        time or '',
+                        noveltyType,
+                        description,
+                        blobs_json,
+                        names_json,
+                        blobs_json
+                    ))
+                    request_id = cursor.lastrowid
+                    await insert_permit_days(cursor, request_id, current_user['code'], permit_days)
+                    await insert_attachments(cursor, 'permiso', request_id, stored_files)
+                    await connection.commit()
             logger.info("Database insert successful")
         except Exception as db_error:
             logger.error(f"Database error: {str(db_error)}")
+            if is_deadlock(db_error):
+                raise HTTPException(status_code=409, detail=DEADLOCK_DETAIL)
             raise
         
-        return {
-            "message": "Solicitud de permiso creada exitosamente",
-            "files": saved_files
-        }
-        
     except Exception as e:
-        # Delete uploaded files if database operation fails
-        for file in saved_files:
-            try:
-                os.remove(os.path.join(UPLOAD_DIR, file['fileUrl']))
-            except Exception as cleanup_error:
-                logger.error(f"Error cleaning up file after failure: {str(cleanup_error)}")
-        
-        connection.rollback()
+        # Stored blobs are kept: identical content may already be referenced by other requests.
+        # Unreferenced blobs are removed later by `python uploads.py --sweep`.
         logger.error(f"Error in create_permit_request: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(
             status_code=500, 
             detail=f"Error al guardar la solicitud: {str(e)}"
         )
-    finally:
-        close_connection(connection)
+
+    # The request is already committed: a failure from here on is only logged
+    try:
+        invalidate_coverage()
+        notify(ADMIN_CHANNEL, "request_created", {
+            "id": request_id, "kind": "permiso", "code": current_user['code'],
+            "name": current_user['name'], "type": noveltyType,
+        })
+        # Thumbnails for the admin list views are rendered in a separate process
+        schedule_thumbnails([blob_path(stored["blob"]) for stored in stored_files])
+    except Exception as e:
+        logger.error(f"Post-commit step failed for permit request {request_id}: {str(e)}")
+
+    return {
+        "message": "Solicitud de permiso creada exitosamente",
+        "files": saved_files
+    }
         
-@app.get("/files/{filename}")
-async def get_file(filename: str):
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(file_path):
+@app.get("/events")
+async def stream_events(request: Request, current_user: dict = Depends(get_stream_user)):
+    """Eventos en tiempo real (SSE): cambios de las solicitudes propias y, para administradores, solicitudes nuevas."""
+    channels = [user_channel(current_user['code'])]
+    if current_user.get('role') == 'admin':
+        channels.append(ADMIN_CHANNEL)
+    return StreamingResponse(
+        event_stream(request, channels),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/db/pool-stats")
+def get_db_pool_stats():
+    return {"sync": get_pool_stats(), "async": get_async_pool_stats()}
+
+@app.get("/auth/cache-stats")
+def get_auth_cache_stats():
+    return get_user_cache_stats()
+
+@app.api_route("/files/{filename}", methods=["GET", "HEAD"])
+async def get_file(filename: str, request: Request):
+    return await serve_attachment(request, filename)
+
+@app.api_route("/files/{filename}/thumb", methods=["GET", "HEAD"])
+async def get_file_thumbnail(filename: str, request: Request):
+    source = resolve_file(filename)
+    if source is None:
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
-    return FileResponse(file_path)
+    try:
+        thumb = await ensure_thumbnail(source)
+    except Exception as e:
+        logger.warning(f"Thumbnail generation failed for {filename}: {str(e)}")
+        raise HTTPException(status_code=404, detail="Vista previa no disponible")
+    etag = await etag_for(filename, source, os.stat(source))
+    return serve_path(request, thumb, os.stat(thumb), etag[:-1] + '-thumb"', immutable=is_blob_name(filename))
+
+@app.api_route("/uploads/{filename}", methods=["GET", "HEAD"])
+async def get_upload(filename: str, request: Request):
+    return await serve_attachment(request, filename)
 
 @app.post("/new-permit-request")
 async def create_new_permit_request(request: PermitRequest2):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor()
     try:
-        # Insertar en la tabla permit_perms con los campos correctos
-        cursor.execute("""
-            INSERT INTO permit_perms 
-            (code, name, telefono, fecha, hora, tipo_novedad, description, solicitud, Aprobado)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            request.code,
-            request.name,
-            request.phone,
-            ','.join(request.dates),  # Convertir lista de fechas a string
-            request.time or '',
-            request.noveltyType,
-            request.description,
-            'approved',  # Valor por defecto para solicitud
-            'pendiente'  # Valor por defecto para Aprobado
-        ))
-        connection.commit()
-        return {"message": "Solicitud de permiso creada exitosamente", "id": cursor.lastrowid}
+        permit_days = parse_days(request.dates)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+    try:
+        async with acquire_connection() as connection:
+            async with connection.cursor() as cursor:
+                await connection.begin()
+                await ensure_no_conflicts(cursor, request.code, permit_days)
+                # Insertar en la tabla permit_perms con los campos correctos
+                await cursor.execute("""
+                    INSERT INTO permit_perms 
+                    (code, name, telefono, fecha, hora, tipo_novedad, description, solicitud, Aprobado)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
+                    request.code,
+                    request.name,
+                    request.phone,
+                    ','.join(request.dates),  # Convertir lista de fechas a string
+                    request.time or '',
+                    request.noveltyType,
+                    request.description,
+                    'approved',  # Valor por defecto para solicitud
+                    'pendiente'  # Valor por defecto para Aprobado
+                ))
+                request_id = cursor.lastrowid
+                await insert_permit_days(cursor, request_id, request.code, permit_days)
+                # Se crea ya aprobada, así que entra en el agregado semanal
+                await cursor.execute(*lookup_statement('permiso', request_id))
+                for query, params in refresh_statements('permiso', *(await cursor.fetchone())):
+                    await cursor.execute(query, params)
+                await connection.commit()
+        invalidate_coverage()
+        notify(ADMIN_CHANNEL, "request_created", {
+            "id": request_id, "kind": "permiso", "code": request.code,
+            "name": request.name, "type": request.noveltyType,
+        })
+        return {"message": "Solicitud de permiso creada exitosamente", "id": request_id}
+    except HTTPException:
+        raise
     except Exception as e:
-        connection.rollback()
+        if is_deadlock(e):
+            raise HTTPException(status_code=409, detail=DEADLOCK_DETAIL)
         raise HTTPException(status_code=500, detail=f"Error al crear la solicitud de permiso: {str(e)}")
-    finally:
-        close_connection(connection)
  
+@app.post("/new-permit-request/batch")
+async def create_new_permit_requests_batch(payload: PermitBatchRequest):
+    """Crea muchos permisos (p. ej. un descanso de toda una base) en una sola transacción."""
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="No se enviaron solicitudes")
+    parsed = []
+    for index, item in enumerate(payload.items):
+        try:
+            parsed.append(parse_days(item.dates))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid date format (elemento {index})")
+
+    try:
+        async with acquire_connection() as connection:
+            async with connection.cursor() as cursor:
+                await connection.begin()
+                # Misma política que los permisos individuales (OVERLAP_ENFORCE y OVERLAP_WINDOW)
+                checked = [checked_days(days) for days in parsed]
+                requested = {}
+                for item, days in zip(payload.items, checked):
+                    requested.setdefault(item.code, set()).update(days)
+                existing = await find_conflicts(cursor, requested, lock=True)
+
+                # Conflictos con permisos ya guardados y entre elementos del mismo lote
+                conflicts, accepted, taken = [], [], {}
+                for index, (item, days, checked_set) in enumerate(zip(payload.items, parsed, checked)):
+                    clashes = {day: ids for day, ids in existing.get(item.code, {}).items() if day in checked_set}
+                    repeated = {day for day in checked_set if (item.code, day) in taken}
+                    if clashes or repeated:
+                        conflicts.append({
+                            "index": index,
+                            "code": item.code,
+                            "dates": sorted(str(day) for day in set(clashes) | repeated),
+                            "permit_ids": sorted({i for ids in clashes.values() for i in ids}),
+                            "batch_indexes": sorted({taken[(item.code, day)] for day in repeated}),
+                        })
+                        continue
+                    for day in checked_set:
+                        taken[(item.code, day)] = index
+                    accepted.append((index, item, days))
+
+                if conflicts and not payload.skip_conflicts:
+                    raise HTTPException(status_code=409, detail={
+                        "message": "Hay permisos que se cruzan con solicitudes existentes",
+                        "conflicts": conflicts,
+                    })
+
+                ids = [None] * len(payload.items)
+                if accepted:
+                    batch_id = uuid.uuid4().hex
+                    await cursor.executemany("""
+                        INSERT INTO permit_perms 
+                        (code, name, telefono, fecha, hora, tipo_novedad, description, solicitud, Aprobado, batch_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """, [
+                        (item.code, item.name, item.phone, ','.join(item.dates), item.time or '',
+                         item.noveltyType, item.description, 'approved', 'pendiente', batch_id)
+                        for _, item, _ in accepted
+                    ])
+                    # Los ids de un INSERT de varias filas crecen en el orden de las filas
+                    await cursor.execute(
+                        "SELECT id, time_created FROM permit_perms WHERE batch_id = %s ORDER BY id", (batch_id,)
+                    )
+                    created = await cursor.fetchall()
+                    await cursor.executemany(
+                        "INSERT INTO permit_days (permit_id, code, day) VALUES (%s, %s, %s)",
+                        [(request_id, item.code, day)
+                         for (request_id, _), (_, item, days) in zip(created, accepted) for day in days]
+                    )
+
+                    # Se crean ya aprobados: recalcular el agregado de cada semana afectada
+                    codes_by_week = {}
+                    for (request_id, created_at), (index, item, _) in zip(created, accepted):
+                        ids[index] = request_id
+                        codes_by_week.setdefault(week_start_of(created_at), set()).add(item.code)
+                    for week_start, codes in codes_by_week.items():
+                        for query, params in refresh_codes_statements('permiso', codes, week_start):
+                            await cursor.execute(query, params)
+                await connection.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        if is_deadlock(e):
+            raise HTTPException(status_code=409, detail=DEADLOCK_DETAIL)
+        raise HTTPException(status_code=500, detail=f"Error al crear las solicitudes de permiso: {str(e)}")
+
+    if accepted:
+        invalidate_coverage()
+    for index, item, _ in accepted:
+        notify(ADMIN_CHANNEL, "request_created", {
+            "id": ids[index], "kind": "permiso", "code": item.code, "name": item.name, "type": item.noveltyType,
+        })
+    return {
+        "message": f"{len(accepted)} solicitudes de permiso creadas exitosamente",
+        "created": len(accepted),
+        "ids": ids,
+        "conflicts": conflicts,
+    }
+
+@app.post("/update-approval/bulk")
+async def update_approval_bulk(payload: BulkApprovalUpdate):
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="No se enviaron solicitudes")
+    try:
+        async with acquire_connection() as connection:
+            results = await apply_bulk(
+                connection,
+                [('permiso', item.id, {'Aprobado': item.approved_by}) for item in payload.items],
+                ['Aprobado']
+            )
+        return _bulk_response(results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error updating approvals: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al actualizar las aprobaciones: {str(e)}")
+
 @app.put("/update-approval/{request_id}")
 async def update_approval(request_id: int, approval: ApprovalUpdate):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor()
     try:
-        cursor.execute("""
-            UPDATE permit_perms
-            SET Aprobado = %s
-            WHERE id = %s
-        """, (approval.approved_by, request_id))
-        connection.commit()
-        if cursor.rowcount == 0:
+        updated, _ = await db_execute("UPDATE permit_perms SET Aprobado = %s WHERE id = %s",
+                                      (approval.approved_by, request_id))
+        if updated == 0:
             raise HTTPException(status_code=404, detail="Solicitud no encontrada")
         return {"message": "Aprobación actualizada exitosamente"}
+    except HTTPException:
+        raise
     except Exception as e:
-        connection.rollback()
         print(f"Error updating approval: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al actualizar la aprobación: {str(e)}")
-    finally:
-        close_connection(connection)
  
 @app.post("/equipment-request")
 def create_equipment_request(request: EquipmentRequest, current_user: dict = Depends(get_current_user)):
@@ -308,7 +518,10 @@ def create_equipment_request(request: EquipmentRequest, current_user: dict = Dep
             request.codePM,
             request.shift
         ))
+        request_id = cursor.lastrowid
         connection.commit()
+        # La zona/turno del empleado puede haber cambiado
+        invalidate_coverage()
         
     except Exception as e:
         connection.rollback()
@@ -320,489 +533,289 @@ def create_equipment_request(request: EquipmentRequest, current_user: dict = Dep
     finally:
         close_connection(connection)
     
+    notify(ADMIN_CHANNEL, "request_created", {
+        "id": request_id, "kind": "equipo", "code": current_user['code'],
+        "name": current_user['name'], "type": request.type,
+    })
     return {"message": "Solicitud de equipo creada exitosamente"}
 
+def _directory_page(total, rows):
+    return FastJSONResponse(rows, headers={"X-Total-Count": str(total)})
+
 @app.get("/users/list")
-async def get_users_list():
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor(dictionary=True)
+async def get_users_list(
+    q: Optional[str] = Query(None, description="Búsqueda por código o nombre"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
     try:
-        cursor.execute("""
-            SELECT code, name 
-            FROM users 
-            WHERE role = 'employee'
-            ORDER BY code
-        """)
-        users = cursor.fetchall()
-        return users
+        await directory.ensure_fresh()
+        total, users = directory.search(q, role='employee', offset=offset, limit=limit)
+        return _directory_page(total, [{"code": u["code"], "name": u["name"]} for u in users])
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database error:", str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener la lista de usuarios: {str(e)}"
         )
-    finally:
-        close_connection(connection)
 
 @app.get("/user/lists")
 
-async def get_users_list():
-
-    connection = create_connection()
-
-    if connection is None:
-
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    cursor = connection.cursor(dictionary=True)
+async def get_users_list(
+    q: Optional[str] = Query(None, description="Búsqueda por código o nombre"),
+    role: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
 
     try:
 
-        cursor.execute("SELECT * FROM users")
+        await directory.ensure_fresh()
 
-        users = cursor.fetchall()
+        return _directory_page(*directory.search(q, role=role, offset=offset, limit=limit))
 
-        return users
+    except HTTPException:
+
+        raise
 
     except Exception as e:
 
         raise HTTPException(status_code=500, detail=f"Error al obtener usuarios: {str(e)}")
 
-    finally:
-
-        close_connection(connection)
+RequestList = List[Union[PermitListItem, EquipmentListItem]]
+
+@app.get("/requests", response_model=RequestList)
+def get_requests(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Sin limit ni cursor se devuelven todas las filas"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    status_filter: Optional[str] = Query(None, alias="status", description="pending, approved o rejected"),
+    type_filter: Optional[str] = Query(None, alias="type", description="Tipo de novedad"),
+    code: Optional[str] = Query(None, description="Código del empleado"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+):
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    # Los listados del frontend piden /requests sin paginar; solo se pagina si se pide
+    if limit is None and position is not None:
+        limit = DEFAULT_PAGE_SIZE
 
-@app.get("/requests")
-def get_requests():
     connection = create_connection()
     if connection is None:
         raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
     
-    cursor = connection.cursor(dictionary=True)
+    cursor = connection.cursor()
     try:
+        # Orden global: time_created DESC, id DESC y, en empate, 'equipo' antes que 'permiso'.
+        # Con limit, cada tabla trae como máximo limit + 1 filas y se mezclan en memoria.
+        where, params = request_filters(status_filter, type_filter, code, date_from, date_to, position,
+                                         inclusive=position is not None and position[2] == 'equipo')
         # Fetch permit requests - note that for permits, tipo_novedad is the type of permit
-        cursor.execute("""
-            SELECT 
-                id, 
-                code, 
-                name, 
-                telefono as phone, 
-                fecha as dates, 
-                hora as time, 
-                tipo_novedad as type,
-                tipo_novedad as noveltyType, 
-                description,
-                files, 
-                time_created as createdAt, 
-                solicitud as status,
-                respuesta as reason, 
-                notifications
-            FROM permit_perms
-        """)
-        permit_requests = cursor.fetchall()
+        cursor.execute(*requests_page_statement(PermitListRow, 'permit_perms', where, params, limit))
+        permit_requests = from_rows(PermitListRow, cursor.fetchall())
 
+        where, params = request_filters(status_filter, type_filter, code, date_from, date_to, position, inclusive=False)
         # Fetch equipment requests - note that for equipment, tipo_novedad is the type itself
-        cursor.execute("""
-            SELECT 
-                id, 
-                code, 
-                name, 
-                tipo_novedad as type,
-                description, 
-                time_created as createdAt,
-                solicitud as status, 
-                respuesta as reason, 
-                notifications, 
-                zona, 
-                comp_am as codeAM, 
-                comp_pm as codePM,
-                turno as shift
-            FROM permit_post
-        """)
-        equipment_requests = cursor.fetchall()
-        
-        # Process the requests to ensure consistent format
-        for request in permit_requests + equipment_requests:
-            # Convert any None/NULL values to empty strings or appropriate defaults
-            for key in request:
-                if request[key] is None:
-                    request[key] = ""
-            
-            # Ensure dates are properly formatted if they exist
-            if request.get('dates'):
-                if isinstance(request['dates'], str):
-                    request['dates'] = [request['dates']]
-                elif isinstance(request['dates'], (list, tuple)):
-                    request['dates'] = list(request['dates'])
-            
-            # Convert files to list if it's a string
-            if request.get('files') and isinstance(request['files'], str):
-                try:
-                    request['files'] = request['files'].split(',')
-                except:
-                    request['files'] = [request['files']]
-            
-            # Ensure status is one of: pending, approved, rejected
-            if request['status'] not in ['pending', 'approved', 'rejected']:
-                request['status'] = 'pending'
-                    
-        return permit_requests + equipment_requests
+        cursor.execute(*requests_page_statement(EquipmentListRow, 'permit_post', where, params, limit))
+        equipment_requests = from_rows(EquipmentListRow, cursor.fetchall())
+
+        page, next_cursor = merge_pages(permit_requests, equipment_requests, limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return FastJSONResponse(page, headers=headers)
         
     finally:
         cursor.close()
         close_connection(connection)
 
-@app.get("/requests/{code}")
-def get_requests(code: str):
+@app.get("/requests/{code}", response_model=RequestList)
+def get_requests(code: str, request: Request):
     connection = create_connection()
     if connection is None:
         raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
     
-    cursor = connection.cursor(dictionary=True)
+    cursor = connection.cursor()
     try:
+        # Si nada cambió desde la última consulta del cliente se responde 304 sin más consultas
+        cursor.execute(WATERMARK_QUERY, watermark_params(code))
+        etag = watermark_etag("requests", code, cursor.fetchone())
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
         # Fetch permit requests - note that for permits, tipo_novedad is the type of permit
-        cursor.execute(
-            """
-            SELECT 
-                id, 
-                code, 
-                name, 
-                telefono as phone, 
-                fecha as dates, 
-                hora as time, 
-                tipo_novedad as type,
-                tipo_novedad as noveltyType, 
-                description,
-                files, 
-                time_created as createdAt, 
-                solicitud as status,
-                respuesta as reason, 
-                notifications
-            FROM permit_perms
-            WHERE code = %s AND notifications = '0'
-            """,
-            (code,)
-        )
-        permit_requests = cursor.fetchall()
+        cursor.execute(*unnotified_statement(PermitListRow, 'permit_perms', code))
+        permit_requests = from_rows(PermitListRow, cursor.fetchall())
 
         # Fetch equipment requests - note that for equipment, tipo_novedad is the type itself
-        cursor.execute(
-            """
-            SELECT 
-                id, 
-                code, 
-                name, 
-                tipo_novedad as type,
-                description, 
-                time_created as createdAt,
-                solicitud as status, 
-                respuesta as reason, 
-                notifications, 
-                zona, 
-                comp_am as codeAM, 
-                comp_pm as codePM,
-                turno as shift
-            FROM permit_post
-            WHERE code = %s AND notifications = '0'    
-            """,
-            (code,)
-        )
-        equipment_requests = cursor.fetchall()
+        cursor.execute(*unnotified_statement(EquipmentListRow, 'permit_post', code))
+        equipment_requests = from_rows(EquipmentListRow, cursor.fetchall())
         
-        # Process the requests to ensure consistent format
-        for request in permit_requests + equipment_requests:
-            # Convert any None/NULL values to empty strings or appropriate defaults
-            for key in request:
-                if request[key] is None:
-                    request[key] = ""
-            
-            # Ensure dates are properly formatted if they exist
-            if request.get('dates'):
-                if isinstance(request['dates'], str):
-                    request['dates'] = [request['dates']]
-                elif isinstance(request['dates'], (list, tuple)):
-                    request['dates'] = list(request['dates'])
-            
-            # Convert files to list if it's a string
-            if request.get('files') and isinstance(request['files'], str):
-                try:
-                    request['files'] = request['files'].split(',')
-                except:
-                    request['files'] = [request['files']]
-            
-            # Ensure status is one of: pending, approved, rejected
-            if request['status'] not in ['pending', 'approved', 'rejected']:
-                request['status'] = 'pending'
-        
-        return permit_requests + equipment_requests
+        return FastJSONResponse(permit_requests + equipment_requests, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
         
     finally:
         cursor.close()
         close_connection(connection)
 
-@app.get("/historical-records")
+@app.get("/historical-records", response_model=List[HistoricalRecord])
 async def get_historical_records(week: Optional[int] = Query(None, description="Week number to filter by")):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor(dictionary=True)
     try:
         current_date = datetime.now()
-        start_of_week = current_date - timedelta(days=current_date.weekday())
-        end_of_week = start_of_week + timedelta(days=6)
+        start_of_week = week_start_of(current_date)
 
         if week is not None:
-            # If a specific week is requested, calculate its start and end dates
+            # If a specific week is requested, calculate its start date
             year = current_date.year
-            start_of_week = datetime.strptime(f'{year}-W{week}-1', "%Y-W%W-%w")
-            end_of_week = start_of_week + timedelta(days=6)
+            start_of_week = datetime.strptime(f'{year}-W{week}-1', "%Y-W%W-%w").date()
 
-        # Fetch only approved records from permit_perms
-        cursor.execute("""
-            SELECT 
-            ANY_VALUE(id) as id,
-            code,
-            name,
-            ANY_VALUE(telefono) as telefono,
-            'permiso' as tipo,
-            tipo_novedad as novedad,
-            ANY_VALUE(hora) as hora,
-            MIN(fecha) as fecha_inicio,
-            MAX(fecha) as fecha_fin,
-            ANY_VALUE(description) as description,
-            ANY_VALUE(respuesta) as respuesta,
-            ANY_VALUE(solicitud) as solicitud,
-            'permiso' as request_type
-            FROM permit_perms
-            WHERE solicitud = 'approved'
-            AND tipo_novedad NOT IN ('descanso', 'licencia')
-            AND DATE(time_created) BETWEEN %s AND %s
-            GROUP BY code, name, tipo_novedad
-        """, (start_of_week.date(), end_of_week.date()))
-        permit_records = cursor.fetchall()
-
-        # Fetch only approved records from permit_post
-        cursor.execute("""
-            SELECT 
-                ANY_VALUE(id) as id,
-                code,
-                name,
-                '' as telefono,
-                'equipo' as tipo,
-                tipo_novedad as novedad,
-                '' as hora,
-                MIN(time_created) as fecha_inicio,
-                MAX(time_created) as fecha_fin,
-                ANY_VALUE(description) as description,
-                ANY_VALUE(respuesta) as respuesta,
-                ANY_VALUE(solicitud) as solicitud,
-                'equipo' as request_type
-            FROM permit_post
-            WHERE solicitud = 'approved'
-                AND DATE(time_created) BETWEEN %s AND %s
-            GROUP BY code, name, tipo_novedad
-        """, (start_of_week.date(), end_of_week.date()))
-        equipment_records = cursor.fetchall()
-
-        # Combine and process all records
-        all_records = permit_records + equipment_records
-        
-        # Process the data for consistent format
-        for record in all_records:
-            # Convert datetime to string for both start and end dates
-            if isinstance(record['fecha_inicio'], datetime):
-                record['fecha_inicio'] = record['fecha_inicio'].strftime('%Y-%m-%d')
-            if isinstance(record['fecha_fin'], datetime):
-                record['fecha_fin'] = record['fecha_fin'].strftime('%Y-%m-%d')
-    
-            # Separate start and end dates
-            fechas = record['fecha_inicio'].split(',')
-            record['fecha_inicio'] = fechas[0] if fechas else ''
-    
-            fechas = record['fecha_fin'].split(',')
-            record['fecha_fin'] = fechas[-1] if fechas else ''
-    
-            # Ensure all fields have a value
-            for key in record:
-                if record[key] is None:
-                    record[key] = ""
+        # Read the precomputed weekly slice (see rollups.py)
+        all_records = from_rows(HistoricalRow, await fetch_rows(*weekly_records_statement(start_of_week)))
 
-        return all_records
+        return FastJSONResponse(all_records)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database error:", str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener los registros históricos: {str(e)}"
         )
-    finally:
-        close_connection(connection)
+
+def _notify_status_changes(results, changes):
+    """Avisa a cada empleado de las solicitudes suyas que se aprobaron, rechazaron o respondieron."""
+    for result in results:
+        if result['result'] == 'updated':
+            status_value, respuesta = changes[(result['kind'], result['id'])]
+            notify(user_channel(result['code']), "request_updated", {
+                "id": result['id'], "kind": result['kind'], "status": status_value, "respuesta": respuesta,
+            })
+
+def _bulk_response(results):
+    updated = sum(1 for r in results if r['result'] == 'updated')
+    return {"updated": updated, "not_found": len(results) - updated, "results": results}
+
+@app.post("/requests/bulk-status")
+async def update_requests_bulk(payload: BulkStatusUpdate):
+    """Aprueba o rechaza muchas solicitudes en una sola transacción."""
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="No se enviaron solicitudes")
+    try:
+        async with acquire_connection() as connection:
+            results = await apply_bulk(
+                connection,
+                [(item.kind, item.id, {'solicitud': item.status, 'respuesta': item.respuesta or ''})
+                 for item in payload.items],
+                ['solicitud', 'respuesta'],
+                refresh_rollup=True
+            )
+        invalidate_coverage()
+        _notify_status_changes(results, {(item.kind, item.id): (item.status, item.respuesta or '')
+                                          for item in payload.items})
+        return _bulk_response(results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al actualizar las solicitudes: {str(e)}")
+
+@app.post("/requests/bulk-notifications")
+async def update_notifications_bulk(payload: BulkNotificationUpdate):
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="No se enviaron solicitudes")
+    try:
+        async with acquire_connection() as connection:
+            results = await apply_bulk(
+                connection,
+                [(item.kind, item.id, {'notifications': item.notification_status}) for item in payload.items],
+                ['notifications']
+            )
+        return _bulk_response(results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al actualizar las notificaciones: {str(e)}")
+
+RequestKind = Literal['permiso', 'equipo']
 
 @app.put("/requests/{request_id}")
-def update_request(
+async def update_request(
     request_id: int,
-    request: dict
+    request: RequestStatusUpdate,
+    kind: RequestKind = Query(..., description="permiso o equipo")
 ):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor()
+    status_value, respuesta = request.status, request.respuesta or ""
     try:
-        cursor.execute("""
-            UPDATE permit_perms
-            SET solicitud = %s, respuesta = %s
-            WHERE id = %s
-        """, (request['status'], request.get('respuesta', ''), request_id))
-        
-        if cursor.rowcount == 0:
-            cursor.execute("""
-                UPDATE permit_post
-                SET solicitud = %s, respuesta = %s
-                WHERE id = %s
-            """, (request['status'], request.get('respuesta', ''), request_id))
-            
-            if cursor.rowcount == 0:
-                raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-        
-        connection.commit()
+        async with acquire_connection() as connection:
+            async with connection.cursor() as cursor:
+                await connection.begin()
+                await cursor.execute(
+                    f"UPDATE {REQUEST_TABLES[kind]} SET solicitud = %s, respuesta = %s WHERE id = %s",
+                    (status_value, respuesta, request_id)
+                )
+                if cursor.rowcount == 0:
+                    raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+                await cursor.execute(*lookup_statement(kind, request_id))
+                code, created_at = await cursor.fetchone()
+
+                # Recalcular el agregado semanal de la semana afectada
+                for query, params in refresh_statements(kind, code, created_at):
+                    await cursor.execute(query, params)
+                await connection.commit()
+        invalidate_coverage()
+        notify(user_channel(code), "request_updated", {
+            "id": request_id, "kind": kind, "status": status_value, "respuesta": respuesta,
+        })
         return {"message": "Solicitud actualizada exitosamente"}
-        
+    except HTTPException:
+        raise
     except Exception as e:
-        connection.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-        
-    finally:
-        close_connection(connection)
 
 @app.put("/requests/{request_id}/notifications")
-def update_notification_status(
+async def update_notification_status(
     request_id: int,
-    payload: NotificationStatusUpdate
+    payload: NotificationStatusUpdate,
+    kind: RequestKind = Query(..., description="permiso o equipo")
 ):
-    print("Request payload:", payload)
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor()
     try:
-        # Intentar actualizar en permit_perms primero
-        cursor.execute("""
-            UPDATE permit_perms
-            SET notifications = %s
-            WHERE id = %s
-        """, (payload.notification_status, request_id))
-        
-        if cursor.rowcount == 0:
-            # Intentar en permit_post si no hubo coincidencia
-            cursor.execute("""
-                UPDATE permit_post
-                SET notifications = %s
-                WHERE id = %s
-            """, (payload.notification_status, request_id))
-            
-            if cursor.rowcount == 0:
-                raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-        
-        connection.commit()
+        updated, _ = await db_execute(
+            f"UPDATE {REQUEST_TABLES[kind]} SET notifications = %s WHERE id = %s",
+            (payload.notification_status, request_id)
+        )
+        if updated == 0:
+            raise HTTPException(status_code=404, detail="Solicitud no encontrada")
         return {"message": "Estado de notificación actualizado exitosamente"}
-        
+    except HTTPException:
+        raise
     except Exception as e:
-        connection.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        close_connection(connection)
 
-@app.get("/solicitudes")
-def get_solicitudes(current_user: dict = Depends(get_current_user)):
+@app.get("/solicitudes", response_model=List[SolicitudResponse])
+def get_solicitudes(request: Request, current_user: dict = Depends(get_current_user)):
     connection = create_connection()
     if connection is None:
         raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
     
-    cursor = connection.cursor(dictionary=True)
+    cursor = connection.cursor()
     try:
-        # Obtener solicitudes de permisos con todos los campos relevantes
-        cursor.execute("""
-            SELECT 
-                id,
-                code,
-                name,
-                telefono,
-                fecha,
-                hora,
-                tipo_novedad,
-                description,
-                files,
-                time_created as createdAt,
-                solicitud as status,
-                respuesta,
-                notifications,
-                file_name,
-                file_url,
-                '' as zona,
-                '' as comp_am,
-                '' as comp_pm,
-                '' as turno,
-                'permiso' as request_type
-            FROM permit_perms
-            WHERE code = %s AND solicitud IN ('approved', 'rejected')
-        """, (current_user['code'],))
-        permit_requests = cursor.fetchall()
-
-        # Obtener solicitudes de equipos con todos los campos relevantes
-        cursor.execute("""
-            SELECT 
-                id,
-                code,
-                name,
-                tipo_novedad,
-                description,
-                time_created as createdAt,
-                solicitud as status,
-                respuesta,
-                notifications,
-                zona,
-                comp_am,
-                comp_pm,
-                turno,
-                '' as telefono,
-                '' as fecha,
-                '' as hora,
-                '' as files,
-                '' as file_name,
-                '' as file_url,
-                'solicitud' as request_type
-            FROM permit_post
-            WHERE code = %s AND solicitud IN ('approved', 'rejected')
-        """, (current_user['code'],))
-        equipment_requests = cursor.fetchall()
+        cursor.execute(WATERMARK_QUERY, watermark_params(current_user['code']))
+        etag = watermark_etag("solicitudes", current_user['code'], cursor.fetchone())
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        # Obtener solicitudes de permisos y de equipos con las mismas columnas
+        cursor.execute(*answered_statement('permit_perms', current_user['code']))
+        permit_requests = from_rows(SolicitudRow, cursor.fetchall())
+
+        cursor.execute(*answered_statement('permit_post', current_user['code']))
+        equipment_requests = from_rows(SolicitudRow, cursor.fetchall())
         
-        # Combinar y procesar todas las solicitudes
         all_requests = permit_requests + equipment_requests
-        
-        # Procesar los datos para un formato consistente
-        for request in all_requests:
-            # Convertir datetime a string
-            if isinstance(request['createdAt'], datetime):
-                request['createdAt'] = request['createdAt'].isoformat()
-            
-            # Procesar archivos si existen
-            if request['files'] and isinstance(request['files'], str):
-                try:
-                    request['files'] = request['files'].split(',')
-                except:
-                    request['files'] = [request['files']]
-            
-            # Asegurar que todos los campos tengan un valor
-            for key in request:
-                if request[key] is None:
-                    request[key] = ""
-        
-        return JSONResponse(content=json.loads(json.dumps(all_requests, default=str)))
+        return FastJSONResponse(all_requests, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
         
     except Exception as e:
         print("Database error:", str(e))
@@ -814,64 +827,49 @@ def get_solicitudes(current_user: dict = Depends(get_current_user)):
         close_connection(connection)
         
 @app.get("/user/{code}")
-def get_user_by_code(code: str):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT code, name, telefone as phone FROM users WHERE code = %s", (code,))
-        user = cursor.fetchone()
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        return user
-    finally:
-        close_connection(connection)
+async def get_user_by_code(code: str):
+    await directory.ensure_fresh()
+    user = directory.get(code)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return {"code": user["code"], "name": user["name"], "phone": user.get("telefone")}
         
 @app.delete("/requests/{request_id}")
-async def delete_request(request_id: int):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor()
+async def delete_request(request_id: int, kind: RequestKind = Query(..., description="permiso o equipo")):
     try:
-        # Intentar eliminar de permit_perms primero
-        cursor.execute("DELETE FROM permit_perms WHERE id = %s", (request_id,))
-        
-        if cursor.rowcount == 0:
-            # Si no se eliminó nada de permit_perms, intentar en permit_post
-            cursor.execute("DELETE FROM permit_post WHERE id = %s", (request_id,))
-            
-            if cursor.rowcount == 0:
-                raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-        
-        connection.commit()
+        async with acquire_connection() as connection:
+            async with connection.cursor() as cursor:
+                await connection.begin()
+                # code y time_created ubican el trozo del agregado que hay que recalcular
+                await cursor.execute(*lookup_statement(kind, request_id))
+                row = await cursor.fetchone()
+                if not row:
+                    raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+                await cursor.execute(f"DELETE FROM {REQUEST_TABLES[kind]} WHERE id = %s", (request_id,))
+                # Sin filas en attachments, la limpieza de uploads.py puede recoger sus blobs
+                await cursor.execute(
+                    "DELETE FROM attachments WHERE request_kind = %s AND request_id = %s", (kind, request_id)
+                )
+                
+                # Recalcular el agregado semanal de la semana afectada
+                for query, params in refresh_statements(kind, *row):
+                    await cursor.execute(query, params)
+                
+                await connection.commit()
+        invalidate_coverage()
         return {"message": "Solicitud eliminada exitosamente"}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        connection.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar la solicitud: {str(e)}")
-    
-    finally:
-        close_connection(connection)    
 
 @app.get("/permit-request/{request_id}")
 async def get_permit_request(request_id: int):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT * FROM permit_perms WHERE id = %s", (request_id,))
-        request = cursor.fetchone()
-        if not request:
-            raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-        return request
-    finally:
-        close_connection(connection)
+    request = await fetch_one("SELECT * FROM permit_perms WHERE id = %s", (request_id,))
+    if not request:
+        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+    return request
         
 
 
@@ -879,52 +877,32 @@ async def get_permit_request(request_id: int):
 
 async def delete_user(code: str):
 
-    connection = create_connection()
-
-    if connection is None:
-
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
+    try:
 
-    
+        await db_execute("DELETE FROM users WHERE code = %s", (code,))
 
-    cursor = connection.cursor()
+        invalidate_user(code)
 
-    try:
+        directory.remove(code)
 
-        cursor.execute("DELETE FROM users WHERE code = %s", (code,))
+        return {"message": "Usuario eliminado exitosamente"}
 
-        connection.commit()
+    except HTTPException:
 
-        return {"message": "Usuario eliminado exitosamente"}
+        raise
 
     except Exception as e:
 
-        connection.rollback()
-
         raise HTTPException(status_code=500, detail=f"Error al eliminar usuario: {str(e)}")
 
-    finally:
-
-        close_connection(connection)
-
 
 @app.put("/users/{code}")
 
 async def update_user(code: str, user: UserResponse):
 
-    connection = create_connection()
-
-    if connection is None:
-
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-
-    
-
-    cursor = connection.cursor()
-
     try:
 
-        cursor.execute("""
+        await db_execute("""
 
             UPDATE users
 
@@ -934,149 +912,95 @@ async def update_user(code: str, user: UserResponse):
 
         """, (user.name, user.phone, user.email, user.password, code))
 
-        connection.commit()
+        invalidate_user(code)
+
+        await directory.refresh_user(code)
 
         return {"message": "Usuario actualizado exitosamente"}
 
-    except Exception as e:
+    except HTTPException:
 
-        connection.rollback()
-
-        raise HTTPException(status_code=500, detail=f"Error al actualizar usuario: {str(e)}")
+        raise
 
-    finally:
+    except Exception as e:
 
-        close_connection(connection)
+        raise HTTPException(status_code=500, detail=f"Error al actualizar usuario: {str(e)}")
         
-from collections import defaultdict
-
 @app.get("/excel")
-async def get_excel():
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor(dictionary=True)
+async def get_excel(
+    format: Optional[Literal["csv", "xlsx"]] = Query(None, description="Descargar como archivo en lugar de JSON"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    type: Optional[str] = Query(None, description="Tipo de novedad"),
+):
+    # Agrupamos por claves compuestas; el rango sale de permit_days
+    query, params = permit_summary_query(date_from, date_to, type)
     try:
-        cursor.execute("""
-            SELECT 
-                code,
-                name,
-                telefono,
-                fecha,
-                tipo_novedad AS novedad,
-                description,
-                respuesta,
-                solicitud
-            FROM permit_perms
-        """)
-        records = cursor.fetchall()
-
-        # Agrupamos por claves compuestas
-        grouped = defaultdict(list)
-
-        for r in records:
-            key = (r['code'], r['name'], r['telefono'], r['novedad'], r['description'], r['respuesta'])
-            # separa fechas por coma y limpia espacios
-            fechas = [f.strip() for f in r['fecha'].split(',') if f.strip()]
-            grouped[key].extend(fechas)
-
-        # Construimos el resultado final
-        result = []
-        for key, fechas in grouped.items():
-            try:
-                fechas_dt = [datetime.strptime(f, '%Y-%m-%d') for f in fechas]
-                fecha_inicio = min(fechas_dt).strftime('%Y-%m-%d')
-                fecha_fin = max(fechas_dt).strftime('%Y-%m-%d')
-            except ValueError:
-                fecha_inicio = fecha_fin = None  # por si hay fechas mal formateadas
-
-            result.append({
-                'code': key[0],
-                'name': key[1],
-                'telefono': key[2],
-                'fecha_inicio': fecha_inicio,   # <- se mantiene este nombre
-                'fecha_fin': fecha_fin,         # <- se mantiene este nombre
-                'novedad': key[3],
-                'description': key[4],
-                'respuesta': key[5],
-            })
-
-        return result
+        if format:
+            return await export_response(stream_all(query, params), PERMIT_EXPORT_COLUMNS, format, "permisos")
+        return await fetch_all(query, params)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database error:", str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener los registros de permisos: {str(e)}"
         )
-    finally:
-        close_connection(connection)
 
 
 
 @app.get("/excel-novedades")
-async def get_excel():
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor(dictionary=True)
+async def get_excel(
+    format: Optional[Literal["csv", "xlsx"]] = Query(None, description="Descargar como archivo en lugar de JSON"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    type: Optional[str] = Query(None, description="Tipo de novedad"),
+):
+    query, params = permit_summary_query(date_from, date_to, type, order_by_start=True)
     try:
-        # Fetch only approved Descanso or Licencia no remunerada records
-        cursor.execute("""
-            SELECT 
-                code,
-                name,
-                telefono,
-                MIN(fecha) as fecha_inicio,
-                MAX(fecha) as fecha_fin,
-                tipo_novedad as novedad,
-                description,
-                respuesta
-            FROM permit_perms
-            GROUP BY code, name, telefono, tipo_novedad, description, respuesta
-            ORDER BY MIN(fecha);
-
-        """)
-        records = cursor.fetchall()
-        
-        # Process records
-        for record in records:
-            if isinstance(record['fecha_inicio'], datetime):
-                record['fecha_inicio'] = record['fecha_inicio'].strftime('%Y-%m-%d')
-            if isinstance(record['fecha_fin'], datetime):
-                record['fecha_fin'] = record['fecha_fin'].strftime('%Y-%m-%d')
-
-        return records
+        if format:
+            return await export_response(stream_all(query, params), PERMIT_EXPORT_COLUMNS, format, "novedades")
+        return await fetch_all(query, params)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database error:", str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener los registros de permisos: {str(e)}"
         )
-    finally:
-        close_connection(connection)
 
 
+@app.post("/users/import")
+async def import_users_file(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "jsonl"]] = Query(None, description="Por defecto según la extensión del archivo"),
+):
+    """Alta o actualización masiva de usuarios; devuelve el detalle de las filas rechazadas."""
+    try:
+        report = await import_users(file.file, detect_format(file.filename, format))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El archivo debe estar codificado en UTF-8")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al importar usuarios: {str(e)}")
+    finally:
+        directory.expire()
+    for code in report.codes:
+        invalidate_user(code)
+    return report.as_dict()
+
 @app.post("/users")
 
 async def add_user(user: UserResponse):
 
-    connection = create_connection()
-
-    if connection is None:
-
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-
-    
-
-    cursor = connection.cursor()
-
     try:
 
-        cursor.execute("""
+        await db_execute("""
 
             INSERT INTO users (code, name, telefone, email, password)
 
@@ -1084,19 +1008,19 @@ async def add_user(user: UserResponse):
 
         """, (user.code, user.name, user.phone, user.email, user.password))
 
-        connection.commit()
+        invalidate_user(user.code)
 
-        return {"message": "Usuario agregado exitosamente"}
+        await directory.refresh_user(user.code)
 
-    except Exception as e:
+        return {"message": "Usuario agregado exitosamente"}
 
-        connection.rollback()
+    except HTTPException:
 
-        raise HTTPException(status_code=500, detail=f"Error al agregar usuario: {str(e)}")
+        raise
 
-    finally:
+    except Exception as e:
 
-        close_connection(connection)
+        raise HTTPException(status_code=500, detail=f"Error al agregar usuario: {str(e)}")
 
 from datetime import datetime
 from fastapi import HTTPException
@@ -1114,61 +1038,40 @@ app.add_middleware(
 async def get_user_history(code: str):
     """Obtiene el historial de solicitudes de un usuario por su código."""
     logger.info(f"Iniciando solicitud de historial para el código: {code}")
-    connection = None
-    cursor = None
     try:
         logger.debug("Estableciendo conexión a la base de datos...")
-        connection = create_connection()
-        if connection is None:
-            error_msg = "Error: No se pudo establecer conexión con la base de datos"
-            logger.error(error_msg)
-            raise HTTPException(
-                status_code=500,
-                detail=error_msg
-            )
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # Verificar primero si el código existe
-        logger.debug(f"Buscando registros para el código: {code}")
-        
-        # Primero verificar si el usuario existe en la tabla de usuarios
-        cursor.execute("SELECT COUNT(*) as count FROM users WHERE code = %s", (code,))
-        user_exists = cursor.fetchone()['count'] > 0
-        
-        if not user_exists:
-            logger.info(f"El código de usuario no existe: {code}")
-            raise HTTPException(
-                status_code=404,
-                detail=f"No se encontró un usuario con el código {code}"
-            )
-            
-        # Luego verificar si tiene historial
-        cursor.execute("SELECT COUNT(*) as count FROM permit_perms WHERE code = %s", (code,))
-        count_result = cursor.fetchone()
-        
-        if not count_result or count_result['count'] == 0:
-            logger.info(f"No se encontraron registros para el código: {code}")
-            return []  # Retornar lista vacía si no hay registros
-        
-        logger.debug(f"Se encontraron {count_result['count']} registros para el código: {code}")
-            
-        # Obtener el historial
-        query = """
-            SELECT 
-                id, 
-                COALESCE(tipo_novedad, 'Sin tipo') AS type, 
-                COALESCE(CONCAT(fecha, ' ', hora), NOW()) AS createdAt, 
-                COALESCE(solicitud, 'Pendiente') AS status
-            FROM permit_perms
-            WHERE code = %s
-            ORDER BY time_created DESC
-            LIMIT 50
-        """
-        logger.debug(f"Ejecutando consulta: {query} con código: {code}")
-        cursor.execute(query, (code,))
-        
-        history = cursor.fetchall()
+        async with acquire_connection() as connection:
+            async with connection.cursor(aiomysql.DictCursor) as cursor:
+                # Verificar primero si el código existe
+                logger.debug(f"Buscando registros para el código: {code}")
+                
+                # Primero verificar si el usuario existe en la tabla de usuarios
+                await cursor.execute("SELECT COUNT(*) as count FROM users WHERE code = %s", (code,))
+                user_exists = (await cursor.fetchone())['count'] > 0
+                
+                if not user_exists:
+                    logger.info(f"El código de usuario no existe: {code}")
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"No se encontró un usuario con el código {code}"
+                    )
+                    
+                # Luego verificar si tiene historial
+                await cursor.execute("SELECT COUNT(*) as count FROM permit_perms WHERE code = %s", (code,))
+                count_result = await cursor.fetchone()
+                
+                if not count_result or count_result['count'] == 0:
+                    logger.info(f"No se encontraron registros para el código: {code}")
+                    return []  # Retornar lista vacía si no hay registros
+                
+                logger.debug(f"Se encontraron {count_result['count']} registros para el código: {code}")
+                    
+                # Obtener el historial
+                query, params = user_history_statement(code)
+                logger.debug(f"Ejecutando consulta: {query} con código: {code}")
+                await cursor.execute(query, params)
+                
+                history = await cursor.fetchall()
         logger.debug(f"Se obtuvieron {len(history)} registros de historial")
         
         # Procesar las fechas para que sean serializables
@@ -1186,6 +1089,8 @@ async def get_user_history(code: str):
         logger.info(f"Historial obtenido exitosamente para el código: {code}")
         return history
         
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Error en get_user_history para código {code}: {str(e)}"
         logger.error(error_msg, exc_info=True)
@@ -1193,16 +1098,6 @@ async def get_user_history(code: str):
             status_code=500,
             detail=error_msg
         )
-    finally:
-        try:
-            if cursor:
-                cursor.close()
-                logger.debug("Cursor cerrado")
-            if connection:
-                close_connection(connection)
-                logger.debug("Conexión cerrada")
-        except Exception as e:
-            logger.error(f"Error al cerrar recursos: {str(e)}", exc_info=True)
 
 from pydantic import BaseModel
 class DateCheck(BaseModel):
@@ -1210,49 +1105,77 @@ class DateCheck(BaseModel):
 
 @app.post("/check-existing-requests")
 async def check_existing_requests(date_check: DateCheck, current_user: dict = Depends(get_current_user)):
-    connection = create_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-    
-    cursor = connection.cursor(dictionary=True)
     try:
-        # Get the date range for the check
-        today = datetime.now().date()
-        last_wednesday = today - timedelta(days=(today.weekday() - 2) % 7)
-        next_wednesday = last_wednesday + timedelta(days=7)
-        
-        # Convert the input dates to datetime objects
-        check_dates = [datetime.strptime(date, '%Y-%m-%d').date() for date in date_check.dates]
-        
-        # Filter dates to only those within the Wednesday to Wednesday range
-        filtered_dates = [date for date in check_dates if last_wednesday <= date < next_wednesday]
+        try:
+            check_dates = parse_days(date_check.dates)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format")
         
+        # Only the dates inside the configured window are checked (see overlaps.OVERLAP_WINDOW)
+        filtered_dates = within_window(check_dates)
         if not filtered_dates:
-            return {"hasExistingRequest": False}
-        
-        # Check for existing requests in the database
-        placeholders = ', '.join(['%s'] * len(filtered_dates))
-        query = f"""
-            SELECT COUNT(*) as count
-            FROM permit_perms
-            WHERE code = %s
-            AND fecha IN ({placeholders})
-            AND solicitud != 'rejected'
-        """
+            return {"hasExistingRequest": False, "dates": []}
         
-        cursor.execute(query, (current_user['code'], *filtered_dates))
-        result = cursor.fetchone()
+        async with acquire_connection() as connection:
+            async with connection.cursor() as cursor:
+                taken = await conflicting_days(cursor, current_user['code'], filtered_dates)
         
-        return {"hasExistingRequest": result['count'] > 0}
+        return {"hasExistingRequest": bool(taken), "dates": [str(day) for day in taken]}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database error:", str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Error al verificar solicitudes existentes: {str(e)}"
         )
-    finally:
-        close_connection(connection)
+
+@app.get("/coverage")
+async def get_staffing_coverage(
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    group_by: str = Query("zona", description="zona, turno o zona,turno"),
+):
+    """Empleados ausentes (aprobados y pendientes) por día, zona/turno y tipo de novedad."""
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to debe ser posterior a date_from")
+    if (date_to - date_from).days >= MAX_COVERAGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {MAX_COVERAGE_DAYS} días")
+    groups = [g.strip() for g in group_by.split(',') if g.strip()]
+    if not groups or any(g not in GROUP_COLUMNS for g in groups):
+        raise HTTPException(status_code=400, detail="group_by debe ser zona, turno o zona,turno")
+    try:
+        async with acquire_connection() as connection:
+            return await compute_coverage(connection, date_from, date_to, list(dict.fromkeys(groups)))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al calcular la cobertura: {str(e)}")
+
+@app.get("/overlaps")
+async def get_crew_overlaps(
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    codes: Optional[str] = Query(None, description="Códigos de la cuadrilla separados por comas"),
+    min_employees: int = Query(2, ge=1),
+):
+    """Días en que varios empleados (de toda la empresa o de una cuadrilla) coinciden de permiso."""
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to debe ser posterior a date_from")
+    crew = [c.strip() for c in codes.split(',') if c.strip()] if codes else None
+    try:
+        async with acquire_connection() as connection:
+            async with connection.cursor() as cursor:
+                rows = await crew_overlaps(cursor, date_from, date_to, crew, min_employees)
+        return [
+            {"day": day, "employees": employees, "permits": json.loads(permits)}
+            for day, employees, permits in rows
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al calcular los cruces de permisos: {str(e)}")
         
 if __name__ == "__main__":
     import uvicorn
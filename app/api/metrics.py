@@ -0,0 +1,160 @@
+"""Métricas en memoria del proceso, expuestas en formato de texto de Prometheus."""
+import hashlib
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Umbral (en milisegundos) a partir del cual se registra la consulta en el log; 0 lo desactiva
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+    def collect(self):
+        return [line.replace(" counter", " gauge", 1) if line.startswith("# TYPE") else line
+                for line in super().collect()]
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}  # labels -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def total_count(self):
+        with self._lock:
+            return sum(state[2] for state in self._values.values())
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in self._values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', bound)])} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("method", "route"))
+REQUEST_COUNT = Counter(
+    "http_requests_total", "Peticiones HTTP por ruta y código de estado", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Peticiones HTTP en curso", ("method",))
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Duración de las sentencias SQL normalizadas", ("statement",))
+QUERY_ERRORS = Counter(
+    "db_query_errors_total", "Sentencias SQL que terminaron con error", ("statement",))
+DB_ACQUIRE_LATENCY = Histogram(
+    "db_connection_acquire_seconds", "Tiempo de espera para obtener una conexión", ("pool",))
+
+REGISTRY = [REQUEST_LATENCY, REQUEST_COUNT, REQUESTS_IN_FLIGHT, QUERY_LATENCY, QUERY_ERRORS, DB_ACQUIRE_LATENCY]
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)")
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+\b")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def normalize_sql(query):
+    """Texto SQL sin literales ni espacios repetidos, apto como etiqueta de métrica."""
+    query = _WHITESPACE.sub(" ", query).strip()
+    query = query.replace("%s", "?")
+    query = _LITERALS.sub("?", query)
+    query = _IN_LIST.sub("(?+)", query)
+    return query
+
+
+@lru_cache(maxsize=512)
+def statement_label(query):
+    """Etiqueta corta y estable: verbo, primera tabla y hash del SQL normalizado completo.
+
+    El hash distingue consultas que comparten el comienzo y solo difieren en el WHERE
+    o el ORDER BY; el texto completo va al log de consultas lentas.
+    """
+    normalized = normalize_sql(query)
+    verb = normalized.split(" ", 1)[0].upper() if normalized else "?"
+    table = _TABLE.search(normalized)
+    digest = hashlib.sha1(normalized.encode()).hexdigest()[:10]
+    return f"{verb} {table.group(1) if table else '-'} {digest}"
+
+
+def observe_query(query, seconds, failed=False):
+    label = statement_label(query)
+    QUERY_LATENCY.observe(seconds, label)
+    if failed:
+        QUERY_ERRORS.inc(label)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning(f"Consulta lenta ({seconds * 1000:.1f} ms) [{label}]: {normalize_sql(query)}")
+
+
+def observe_acquire(pool, seconds):
+    DB_ACQUIRE_LATENCY.observe(seconds, pool)
+
+
+def render(extra_gauges=()):
+    """Texto de exposición de Prometheus; extra_gauges es una lista de (nombre, ayuda, valor)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    for name, documentation, value in extra_gauges:
+        lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,138 @@
+"""Migraciones versionadas del esquema y verificación de planes de consulta.
+
+Uso:
+    python migrate.py             # aplica las migraciones pendientes
+    python migrate.py --status    # lista migraciones aplicadas y pendientes
+    python migrate.py --check     # EXPLAIN de las consultas críticas; falla si alguna hace full scan
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+from database import create_connection, close_connection
+from conditional import WATERMARK_QUERY, watermark_params
+from overlaps import conflicting_days_statement, crew_overlaps_statement, taken_days_statement
+from pagination import DEFAULT_PAGE_SIZE, request_filters, requests_page_statement
+from records import (EquipmentListRow, PermitListRow, answered_statement, unnotified_statement,
+                     user_history_statement)
+from rollups import refresh_codes_statements, weekly_records_statement
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+_today = date.today()
+_week_start = _today - timedelta(days=_today.weekday())
+
+_sample_code = "0000"
+_sample_cursor = (datetime.now(), 2 ** 31, "permiso")
+
+
+def _hot_queries():
+    """Consultas críticas con parámetros de ejemplo, generadas con los mismos constructores
+    que usan los endpoints para que el EXPLAIN revise exactamente el SQL que se ejecuta."""
+    week_end = _week_start + timedelta(days=7)
+    page_filters = request_filters(cursor=_sample_cursor)
+    return {
+        "requests_page": requests_page_statement(
+            PermitListRow, "permit_perms", *page_filters, DEFAULT_PAGE_SIZE),
+        "requests_page_equipos": requests_page_statement(
+            EquipmentListRow, "permit_post", *page_filters, DEFAULT_PAGE_SIZE),
+        "requests_by_code": unnotified_statement(PermitListRow, "permit_perms", _sample_code),
+        "requests_by_code_equipos": unnotified_statement(EquipmentListRow, "permit_post", _sample_code),
+        "solicitudes_permisos": answered_statement("permit_perms", _sample_code),
+        "solicitudes_equipos": answered_statement("permit_post", _sample_code),
+        "request_watermark": (WATERMARK_QUERY, watermark_params(_sample_code)),
+        "historical_records": weekly_records_statement(_week_start),
+        "rollup_refresh_permisos": refresh_codes_statements("permiso", [_sample_code], _week_start)[1],
+        "rollup_refresh_equipos": refresh_codes_statements("equipo", [_sample_code], _week_start)[1],
+        "history_by_code": user_history_statement(_sample_code),
+        "check_existing_requests": conflicting_days_statement(_sample_code, [_today]),
+        "permit_overlap": taken_days_statement([_sample_code], _week_start, week_end, lock=True),
+        "crew_overlaps": crew_overlaps_statement(_week_start, week_end),
+    }
+
+
+HOT_QUERIES = _hot_queries()
+
+# Tipos de acceso de EXPLAIN que recorren toda la tabla ("ALL") o todo un índice ("index")
+FULL_SCAN_TYPES = {"ALL", "index"}
+
+
+def _split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def _migration_files():
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+
+
+def _applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(connection):
+    cursor = connection.cursor()
+    applied = _applied_versions(cursor)
+    for name in _migration_files():
+        if name in applied:
+            continue
+        print(f"Aplicando {name}...")
+        with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+            for statement in _split_statements(f.read()):
+                cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (name,))
+        connection.commit()
+    print("Esquema actualizado")
+
+
+def status(connection):
+    applied = _applied_versions(connection.cursor())
+    for name in _migration_files():
+        print(f"{'[x]' if name in applied else '[ ]'} {name}")
+
+
+def check_query_plans(connection):
+    """Ejecuta EXPLAIN sobre HOT_QUERIES y devuelve las que recorren una tabla o un índice completos."""
+    cursor = connection.cursor(dictionary=True)
+    failures = []
+    for name, (query, params) in HOT_QUERIES.items():
+        cursor.execute(f"EXPLAIN {query}", params)
+        for row in cursor.fetchall():
+            # En un INSERT ... SELECT la fila de la tabla destino siempre figura como ALL
+            if row.get("select_type") == "INSERT":
+                continue
+            if row.get("type") in FULL_SCAN_TYPES:
+                failures.append((name, row.get("table"), row.get("type"), row.get("rows")))
+    return failures
+
+
+def main(argv):
+    connection = create_connection()
+    if connection is None:
+        print("Error de conexión a la base de datos")
+        return 1
+    try:
+        if "--status" in argv:
+            status(connection)
+        elif "--check" in argv:
+            failures = check_query_plans(connection)
+            for name, table, scan_type, rows in failures:
+                print(f"FULL SCAN ({scan_type}): {name} sobre {table} (~{rows} filas)")
+            if failures:
+                return 1
+            print("Todas las consultas críticas usan índices")
+        else:
+            migrate(connection)
+    finally:
+        close_connection(connection)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,36 @@
+-- Esquema base de las tablas de solicitudes (ya existen en producción)
+
+CREATE TABLE IF NOT EXISTS permit_perms (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    code VARCHAR(50) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    telefono VARCHAR(50),
+    fecha TEXT,
+    hora VARCHAR(50),
+    tipo_novedad VARCHAR(100),
+    description TEXT,
+    files TEXT,
+    file_name TEXT,
+    file_url TEXT,
+    time_created DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    solicitud VARCHAR(20) DEFAULT 'pending',
+    respuesta TEXT,
+    notifications VARCHAR(10) DEFAULT '0',
+    Aprobado VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS permit_post (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    code VARCHAR(50) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    tipo_novedad VARCHAR(100),
+    description TEXT,
+    zona VARCHAR(100),
+    comp_am VARCHAR(50),
+    comp_pm VARCHAR(50),
+    turno VARCHAR(50),
+    time_created DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    solicitud VARCHAR(20) DEFAULT 'pending',
+    respuesta TEXT,
+    notifications VARCHAR(10) DEFAULT '0'
+);
@@ -0,0 +1,21 @@
+-- Índices compuestos para las consultas más frecuentes
+
+-- /solicitudes: code = ? AND solicitud IN (...)
+CREATE INDEX idx_perms_code_status_created ON permit_perms (code, solicitud, time_created);
+-- /history/{code}, /requests?code=: code = ? ORDER BY time_created DESC
+CREATE INDEX idx_perms_code_created ON permit_perms (code, time_created, id);
+-- /requests/{code}: code = ? AND notifications = '0'
+CREATE INDEX idx_perms_code_notifications ON permit_perms (code, notifications);
+-- /historical-records, /requests?status=: solicitud = ? AND time_created en rango
+CREATE INDEX idx_perms_status_created ON permit_perms (solicitud, time_created);
+-- /requests (paginación por cursor) y filtros por rango de fechas
+CREATE INDEX idx_perms_created_id ON permit_perms (time_created, id);
+-- /requests?type=
+CREATE INDEX idx_perms_type_created ON permit_perms (tipo_novedad, time_created);
+
+CREATE INDEX idx_post_code_status_created ON permit_post (code, solicitud, time_created);
+CREATE INDEX idx_post_code_created ON permit_post (code, time_created, id);
+CREATE INDEX idx_post_code_notifications ON permit_post (code, notifications);
+CREATE INDEX idx_post_status_created ON permit_post (solicitud, time_created);
+CREATE INDEX idx_post_created_id ON permit_post (time_created, id);
+CREATE INDEX idx_post_type_created ON permit_post (tipo_novedad, time_created);
@@ -0,0 +1,23 @@
+-- Una fila por cada día solicitado en permit_perms (reemplaza el parseo de la columna fecha)
+
+CREATE TABLE IF NOT EXISTS permit_days (
+    permit_id INT NOT NULL,
+    code VARCHAR(50) NOT NULL,
+    day DATE NOT NULL,
+    PRIMARY KEY (permit_id, day),
+    INDEX idx_days_code_day (code, day),
+    INDEX idx_days_day_code (day, code),
+    CONSTRAINT fk_days_permit FOREIGN KEY (permit_id) REFERENCES permit_perms (id) ON DELETE CASCADE
+);
+
+-- Backfill desde las fechas separadas por comas; se ignoran las que no son YYYY-MM-DD
+INSERT IGNORE INTO permit_days (permit_id, code, day)
+SELECT p.id, p.code, CAST(TRIM(j.d) AS DATE)
+FROM permit_perms p
+JOIN JSON_TABLE(
+    CONCAT('["', REPLACE(p.fecha, ',', '","'), '"]'),
+    '$[*]' COLUMNS (d VARCHAR(32) PATH '$')
+) j
+WHERE p.fecha IS NOT NULL
+    AND p.fecha <> ''
+    AND TRIM(j.d) REGEXP '^[0-9]{4}-[0-9]{2}-[0-9]{2}$';
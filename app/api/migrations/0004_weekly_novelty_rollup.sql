@@ -0,0 +1,19 @@
+-- Agregado semanal para /historical-records (se llena con: python rollups.py --rebuild)
+
+CREATE TABLE IF NOT EXISTS weekly_novelty_rollup (
+    week_start DATE NOT NULL,
+    code VARCHAR(50) NOT NULL,
+    request_type VARCHAR(10) NOT NULL,
+    novedad VARCHAR(100) NOT NULL DEFAULT '',
+    name VARCHAR(100) NOT NULL,
+    id INT NOT NULL,
+    telefono VARCHAR(50),
+    hora VARCHAR(50),
+    fecha_inicio DATE,
+    fecha_fin DATE,
+    description TEXT,
+    respuesta TEXT,
+    solicitud VARCHAR(20),
+    request_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (week_start, code, request_type, novedad, name)
+);
@@ -0,0 +1,15 @@
+-- Metadatos de adjuntos: relación solicitud -> blob direccionado por contenido
+
+CREATE TABLE IF NOT EXISTS attachments (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    request_kind VARCHAR(10) NOT NULL,
+    request_id INT NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    blob_name VARCHAR(80) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    content_type VARCHAR(100) NOT NULL,
+    size INT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_attachments_request (request_kind, request_id),
+    INDEX idx_attachments_blob (blob_name)
+);
@@ -0,0 +1,9 @@
+-- Marca de última modificación por fila, base de los ETag de /solicitudes y /requests/{code}
+
+ALTER TABLE permit_perms
+    ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_perms_code_updated (code, updated_at);
+
+ALTER TABLE permit_post
+    ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_post_code_updated (code, updated_at);
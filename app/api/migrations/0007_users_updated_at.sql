@@ -0,0 +1,5 @@
+-- Marca de modificación de usuarios: permite refrescar el directorio en memoria por diferencias
+
+ALTER TABLE users
+    ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_users_updated (updated_at);
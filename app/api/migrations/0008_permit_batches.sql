@@ -0,0 +1,5 @@
+-- Lote de creación masiva: permite recuperar los ids generados por un INSERT de varias filas
+
+ALTER TABLE permit_perms
+    ADD COLUMN batch_id CHAR(32) NULL,
+    ADD INDEX idx_perms_batch (batch_id);
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum
+from sqlalchemy import Column, Integer, String, Enum, Text, Date, DateTime, ForeignKey, Index, func
 from database import Base
 
 class User(Base):
@@ -9,3 +9,96 @@ class User(Base):
     name = Column(String(100), nullable=False)
     password = Column(String(255), nullable=False)  # Encriptada
     role = Column(Enum("employee", "admin"), default="employee", nullable=False)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now(), index=True)
+
+# Las tablas de solicitudes se crean con migrations/; estos modelos documentan el esquema
+class PermitPerm(Base):
+    __tablename__ = "permit_perms"
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String(50), nullable=False)
+    name = Column(String(100), nullable=False)
+    telefono = Column(String(50))
+    fecha = Column(Text)  # Fechas separadas por comas
+    hora = Column(String(50))
+    tipo_novedad = Column(String(100))
+    description = Column(Text)
+    files = Column(Text)
+    file_name = Column(Text)
+    file_url = Column(Text)
+    time_created = Column(DateTime, nullable=False, server_default=func.now())
+    solicitud = Column(String(20), server_default="pending")
+    respuesta = Column(Text)
+    notifications = Column(String(10), server_default="0")
+    Aprobado = Column(String(100))
+    batch_id = Column(String(32))  # Lote de /new-permit-request/batch
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("idx_perms_code_status_created", "code", "solicitud", "time_created"),
+        Index("idx_perms_code_created", "code", "time_created", "id"),
+        Index("idx_perms_code_notifications", "code", "notifications"),
+        Index("idx_perms_status_created", "solicitud", "time_created"),
+        Index("idx_perms_created_id", "time_created", "id"),
+        Index("idx_perms_type_created", "tipo_novedad", "time_created"),
+        Index("idx_perms_code_updated", "code", "updated_at"),
+        Index("idx_perms_batch", "batch_id"),
+    )
+
+class PermitPost(Base):
+    __tablename__ = "permit_post"
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String(50), nullable=False)
+    name = Column(String(100), nullable=False)
+    tipo_novedad = Column(String(100))
+    description = Column(Text)
+    zona = Column(String(100))
+    comp_am = Column(String(50))
+    comp_pm = Column(String(50))
+    turno = Column(String(50))
+    time_created = Column(DateTime, nullable=False, server_default=func.now())
+    solicitud = Column(String(20), server_default="pending")
+    respuesta = Column(Text)
+    notifications = Column(String(10), server_default="0")
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("idx_post_code_status_created", "code", "solicitud", "time_created"),
+        Index("idx_post_code_created", "code", "time_created", "id"),
+        Index("idx_post_code_notifications", "code", "notifications"),
+        Index("idx_post_status_created", "solicitud", "time_created"),
+        Index("idx_post_created_id", "time_created", "id"),
+        Index("idx_post_type_created", "tipo_novedad", "time_created"),
+        Index("idx_post_code_updated", "code", "updated_at"),
+    )
+
+class PermitDay(Base):
+    __tablename__ = "permit_days"
+
+    permit_id = Column(Integer, ForeignKey("permit_perms.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    code = Column(String(50), nullable=False)
+
+    __table_args__ = (
+        Index("idx_days_code_day", "code", "day"),
+        Index("idx_days_day_code", "day", "code"),
+    )
+
+class Attachment(Base):
+    __tablename__ = "attachments"
+
+    id = Column(Integer, primary_key=True)
+    request_kind = Column(String(10), nullable=False)
+    request_id = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    blob_name = Column(String(80), nullable=False)
+    file_name = Column(String(255), nullable=False)  # Nombre original
+    content_type = Column(String(100), nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_attachments_request", "request_kind", "request_id"),
+        Index("idx_attachments_blob", "blob_name"),
+    )
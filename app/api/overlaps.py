@@ -0,0 +1,176 @@
+"""Detección de solapes entre permisos a partir de permit_days (una fila por día).
+
+Todas las consultas usan los índices (code, day) y (day, code) de permit_days, de modo
+que un permiso de varios días se cruza con cualquiera de sus días y no solo con el texto
+de la columna fecha.
+
+La ventana de verificación se configura con OVERLAP_WINDOW:
+    wednesday_week   de miércoles a miércoles alrededor de hoy (comportamiento histórico)
+    next:<N>         desde hoy y los N días siguientes
+    all              todas las fechas pedidas
+"""
+import os
+from datetime import date, timedelta
+from fastapi import HTTPException
+
+OVERLAP_WINDOW = os.getenv("OVERLAP_WINDOW", "wednesday_week")
+# Si está activo, /permit-request, /new-permit-request y su versión por lotes rechazan (409)
+# los permisos que se cruzan
+OVERLAP_ENFORCE = os.getenv("OVERLAP_ENFORCE", "1") == "1"
+
+ACTIVE_PERMIT_SQL = "p.solicitud != 'rejected'"
+
+# ER_LOCK_DEADLOCK: MySQL abortó la transacción para romper un interbloqueo
+DEADLOCK_ERROR = 1213
+DEADLOCK_DETAIL = "Otra solicitud para las mismas fechas se está guardando; intente de nuevo"
+
+
+def window(policy=None, today=None):
+    """Intervalo semiabierto [inicio, fin) de fechas a verificar, o None si no hay límite."""
+    policy = policy or OVERLAP_WINDOW
+    today = today or date.today()
+    if policy == "all":
+        return None
+    if policy.startswith("next:"):
+        return today, today + timedelta(days=int(policy.split(":", 1)[1]) + 1)
+    if policy == "wednesday_week":
+        last_wednesday = today - timedelta(days=(today.weekday() - 2) % 7)
+        return last_wednesday, last_wednesday + timedelta(days=7)
+    raise ValueError(f"Política de ventana desconocida: {policy}")
+
+
+def within_window(days, policy=None, today=None):
+    bounds = window(policy, today)
+    if bounds is None:
+        return set(days)
+    start, end = bounds
+    return {day for day in days if start <= day < end}
+
+
+def checked_days(days, policy=None):
+    """Días que deben verificarse al crear permisos según OVERLAP_ENFORCE y OVERLAP_WINDOW."""
+    if not OVERLAP_ENFORCE:
+        return set()
+    return within_window(days, policy)
+
+
+def is_deadlock(error):
+    return bool(getattr(error, "args", None)) and error.args[0] == DEADLOCK_ERROR
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def conflicting_days_statement(code, days):
+    days = sorted(days)
+    return f"""
+        SELECT DISTINCT d.day
+        FROM permit_days d
+        JOIN permit_perms p ON p.id = d.permit_id
+        WHERE d.code = %s
+            AND d.day IN ({_placeholders(days)})
+            AND {ACTIVE_PERMIT_SQL}
+        ORDER BY d.day
+    """, (code, *days)
+
+
+def lock_employees_statement(codes):
+    codes = sorted(codes)
+    return f"SELECT code FROM users WHERE code IN ({_placeholders(codes)}) ORDER BY code FOR UPDATE", codes
+
+
+def taken_days_statement(codes, first_day, last_day, lock=False):
+    return f"""
+        SELECT d.code, d.day, d.permit_id
+        FROM permit_days d
+        JOIN permit_perms p ON p.id = d.permit_id
+        WHERE d.code IN ({_placeholders(codes)})
+            AND d.day BETWEEN %s AND %s
+            AND {ACTIVE_PERMIT_SQL}
+        {'FOR UPDATE OF d' if lock else ''}
+    """, (*codes, first_day, last_day)
+
+
+def crew_overlaps_statement(date_from, date_to, codes=None, min_employees=2):
+    filters, params = ["d.day >= %s", "d.day <= %s"], [date_from, date_to]
+    if codes:
+        filters.append(f"d.code IN ({_placeholders(codes)})")
+        params.extend(codes)
+    return f"""
+        SELECT
+            d.day,
+            COUNT(DISTINCT d.code) AS employees,
+            JSON_ARRAYAGG(JSON_OBJECT(
+                'code', d.code, 'name', p.name, 'permit_id', p.id,
+                'type', p.tipo_novedad, 'status', p.solicitud
+            )) AS permits
+        FROM permit_days d
+        JOIN permit_perms p ON p.id = d.permit_id
+        WHERE {' AND '.join(filters)}
+            AND {ACTIVE_PERMIT_SQL}
+        GROUP BY d.day
+        HAVING COUNT(DISTINCT d.code) >= %s
+        ORDER BY d.day
+    """, (*params, min_employees)
+
+
+async def conflicting_days(cursor, code, days):
+    """Días (de los pedidos) en que el empleado ya tiene un permiso no rechazado."""
+    if not days:
+        return []
+    await cursor.execute(*conflicting_days_statement(code, days))
+    return [row[0] for row in await cursor.fetchall()]
+
+
+async def find_conflicts(cursor, requested, lock=False):
+    """Días ya ocupados por permisos no rechazados, para varios empleados en una consulta.
+
+    requested: {código: conjunto de date}. Devuelve {código: {día: [permit_id, ...]}} con
+    solo los días pedidos que ya están tomados.
+
+    Con lock=True se bloquean primero, en orden de código, las filas de los empleados en
+    users y después se leen sus días con FOR UPDATE. Los bloqueos de hueco de InnoDB no se
+    excluyen entre sí, así que bloquear solo el rango de permit_days dejaría que dos
+    transacciones lo leyeran vacío y se interbloquearan al insertar; la fila del empleado
+    las serializa. Para códigos sin fila en users el interbloqueo sigue siendo posible:
+    quien llama debe tratar is_deadlock() como un conflicto y no como un error interno.
+    """
+    requested = {code: days for code, days in requested.items() if days}
+    if not requested:
+        return {}
+    all_days = set().union(*requested.values())
+    codes = sorted(requested)
+    if lock:
+        await cursor.execute(*lock_employees_statement(codes))
+        await cursor.fetchall()
+    await cursor.execute(*taken_days_statement(codes, min(all_days), max(all_days), lock))
+
+    conflicts = {}
+    for code, day, permit_id in await cursor.fetchall():
+        if day in requested[code]:
+            conflicts.setdefault(code, {}).setdefault(day, []).append(permit_id)
+    return conflicts
+
+
+async def ensure_no_conflicts(cursor, code, days, policy=None):
+    """Para los endpoints de creación: 409 si algún día dentro de la ventana ya está tomado.
+
+    Debe llamarse dentro de la transacción que inserta el permiso.
+    """
+    checked = checked_days(days, policy)
+    conflicts = await find_conflicts(cursor, {code: checked}, lock=True)
+    if conflicts:
+        taken = sorted(conflicts[code])
+        raise HTTPException(status_code=409, detail={
+            "message": "Ya existe una solicitud para alguna de las fechas",
+            "dates": [str(day) for day in taken],
+            "permit_ids": sorted({i for ids in conflicts[code].values() for i in ids}),
+        })
+
+
+async def crew_overlaps(cursor, date_from, date_to, codes=None, min_employees=2):
+    """Días del rango en que al menos min_employees empleados (opcionalmente de una
+    cuadrilla dada por sus códigos) tienen permisos no rechazados a la vez."""
+    await cursor.execute(*crew_overlaps_statement(date_from, date_to, codes, min_employees))
+    return await cursor.fetchall()
@@ -0,0 +1,99 @@
+import base64
+import heapq
+import itertools
+import json
+from datetime import datetime, timedelta
+from records import select_list
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at, request_id, kind):
+    """Cursor opaco con la posición (time_created, id, tipo) de la última fila."""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, request_id, kind]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at, request_id, kind = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return datetime.fromisoformat(created_at), int(request_id), kind
+
+
+def keyset_clause(cursor, inclusive=False):
+    """Condición para filas posteriores al cursor en orden (time_created DESC, id DESC)."""
+    created_at, request_id, _ = cursor
+    op = "<=" if inclusive else "<"
+    return f"(time_created < %s OR (time_created = %s AND id {op} %s))", [created_at, created_at, request_id]
+
+
+def date_range_clause(date_from=None, date_to=None):
+    """Rango semiabierto sobre time_created para que el índice sea utilizable."""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("time_created >= %s")
+        params.append(date_from)
+    if date_to:
+        clauses.append("time_created < %s")
+        params.append(date_to + timedelta(days=1))
+    return clauses, params
+
+
+def request_filters(status_filter=None, type_filter=None, code=None, date_from=None, date_to=None,
+                    cursor=None, inclusive=False):
+    """WHERE y parámetros de /requests para una de las dos tablas."""
+    clauses, params = date_range_clause(date_from, date_to)
+    if status_filter == 'pending':
+        # Cualquier estado distinto de aprobado/rechazado se muestra como pendiente
+        clauses.append("(solicitud IS NULL OR solicitud NOT IN ('approved', 'rejected'))")
+    elif status_filter:
+        clauses.append("solicitud = %s")
+        params.append(status_filter)
+    if type_filter:
+        clauses.append("tipo_novedad = %s")
+        params.append(type_filter)
+    if code:
+        clauses.append("code = %s")
+        params.append(code)
+    if cursor:
+        clause, cursor_params = keyset_clause(cursor, inclusive)
+        clauses.append(clause)
+        params.extend(cursor_params)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def requests_page_statement(record, table, where, params, limit=None):
+    """SELECT de una tabla de /requests; con limit trae una fila extra para saber si hay más."""
+    query = f"""
+        SELECT {select_list(record)}
+        FROM {table}
+        {where}
+        ORDER BY time_created DESC, id DESC
+        {"LIMIT %s" if limit is not None else ""}
+    """
+    return query, (*params, limit + 1) if limit is not None else tuple(params)
+
+
+def merge_pages(permit_rows, equipment_rows, limit=None):
+    """Mezcla las filas de ambas tablas, ya ordenadas por (time_created DESC, id DESC).
+
+    En empate de time_created e id va primero 'equipo'. Devuelve (página, cursor
+    siguiente o None); sin limit devuelve todas las filas.
+    """
+    merged = heapq.merge(
+        (((-r.createdAt.timestamp(), -r.id, 'permiso'), r) for r in permit_rows),
+        (((-r.createdAt.timestamp(), -r.id, 'equipo'), r) for r in equipment_rows),
+    )
+    if limit is None:
+        return [r for _, r in merged], None
+    page = list(itertools.islice(merged, limit + 1))
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        (_, _, kind), last = page[-1]
+        next_cursor = encode_cursor(last.createdAt, last.id, kind)
+    return [r for _, r in page], next_cursor
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+# Las fechas de un permiso se guardan en fecha (texto, por compatibilidad) y en permit_days
+
+
+def parse_days(dates):
+    """Convierte fechas 'YYYY-MM-DD' en una lista ordenada y sin duplicados de date.
+
+    Lanza ValueError si dates no es una lista de cadenas o alguna fecha no es válida.
+    """
+    if not isinstance(dates, (list, tuple)):
+        raise ValueError("Se esperaba una lista de fechas")
+    days = set()
+    for d in dates:
+        if not isinstance(d, str):
+            raise ValueError(f"Fecha inválida: {d!r}")
+        if d.strip():
+            days.add(datetime.strptime(d.strip(), '%Y-%m-%d').date())
+    return sorted(days)
+
+
+async def insert_permit_days(cursor, permit_id, code, days):
+    if not days:
+        return
+    await cursor.executemany(
+        "INSERT INTO permit_days (permit_id, code, day) VALUES (%s, %s, %s)",
+        [(permit_id, code, day) for day in days]
+    )
@@ -0,0 +1,158 @@
+"""Filas tipadas y compactas para los listados de solicitudes.
+
+Cada registro es un dataclass con __slots__ cuyos campos llevan la expresión SQL que los
+produce, de modo que la consulta y la forma de la respuesta se declaran una sola vez.
+Las filas se leen con cursores de tuplas y se construyen por posición; orjson serializa
+los dataclasses directamente, sin pasar por diccionarios intermedios.
+"""
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import List, Union
+
+# Los estados desconocidos se muestran como pendientes
+STATUS_SQL = "CASE WHEN solicitud IN ('pending', 'approved', 'rejected') THEN solicitud ELSE 'pending' END"
+
+
+def column(sql=None, **per_table):
+    """Campo con su expresión SQL; per_table permite una expresión distinta por tabla."""
+    return field(metadata={"sql": sql, "per_table": per_table})
+
+
+def select_list(record, table=None):
+    """Lista de columnas del SELECT para el registro, en el orden de sus campos."""
+    expressions = []
+    for f in fields(record):
+        sql = f.metadata.get("per_table", {}).get(table) or f.metadata.get("sql") or f.name
+        expressions.append(sql if sql == f.name else f"{sql} AS {f.name}")
+    return ",\n    ".join(expressions)
+
+
+def from_rows(record, rows):
+    return [record(*row) for row in rows]
+
+
+def unnotified_statement(record, table, code):
+    """/requests/{code}: solicitudes del empleado que aún no se le notificaron."""
+    return f"""
+        SELECT {select_list(record, table)}
+        FROM {table}
+        WHERE code = %s AND notifications = '0'
+    """, (code,)
+
+
+def answered_statement(table, code):
+    """/solicitudes: solicitudes del empleado ya aprobadas o rechazadas."""
+    return f"""
+        SELECT {select_list(SolicitudRow, table)}
+        FROM {table}
+        WHERE code = %s AND solicitud IN ('approved', 'rejected')
+    """, (code,)
+
+
+def user_history_statement(code):
+    """/history/{code}: últimos 50 permisos del empleado."""
+    return """
+        SELECT 
+            id, 
+            COALESCE(tipo_novedad, 'Sin tipo') AS type, 
+            COALESCE(CONCAT(fecha, ' ', hora), NOW()) AS createdAt, 
+            COALESCE(solicitud, 'Pendiente') AS status
+        FROM permit_perms
+        WHERE code = %s
+        ORDER BY time_created DESC
+        LIMIT 50
+    """, (code,)
+
+
+@dataclass(slots=True)
+class PermitListRow:
+    """Permiso en /requests y /requests/{code}."""
+    id: int = column()
+    code: str = column()
+    name: str = column()
+    phone: str = column("COALESCE(telefono, '')")
+    dates: Union[str, List[str]] = column("COALESCE(fecha, '')")
+    time: str = column("COALESCE(hora, '')")
+    type: str = column("COALESCE(tipo_novedad, '')")
+    noveltyType: str = column("COALESCE(tipo_novedad, '')")
+    description: str = column("COALESCE(description, '')")
+    files: Union[str, List[str]] = column("COALESCE(files, '')")
+    createdAt: datetime = column("time_created")
+    status: str = column(STATUS_SQL)
+    reason: str = column("COALESCE(respuesta, '')")
+    notifications: str = column("COALESCE(notifications, '')")
+    kind: str = column("'permiso'")
+
+    def __post_init__(self):
+        # Formato histórico del frontend: la cadena de fechas completa dentro de una lista
+        if self.dates:
+            self.dates = [self.dates]
+        if self.files:
+            self.files = self.files.split(',')
+
+
+@dataclass(slots=True)
+class EquipmentListRow:
+    """Solicitud de equipo en /requests y /requests/{code}."""
+    id: int = column()
+    code: str = column()
+    name: str = column()
+    type: str = column("COALESCE(tipo_novedad, '')")
+    description: str = column("COALESCE(description, '')")
+    createdAt: datetime = column("time_created")
+    status: str = column(STATUS_SQL)
+    reason: str = column("COALESCE(respuesta, '')")
+    notifications: str = column("COALESCE(notifications, '')")
+    zona: str = column("COALESCE(zona, '')")
+    codeAM: str = column("COALESCE(comp_am, '')")
+    codePM: str = column("COALESCE(comp_pm, '')")
+    shift: str = column("COALESCE(turno, '')")
+    kind: str = column("'equipo'")
+
+
+@dataclass(slots=True)
+class SolicitudRow:
+    """Solicitud respondida en /solicitudes; ver schemas.SolicitudResponse."""
+    id: int = column()
+    code: str = column()
+    name: str = column()
+    telefono: str = column(permit_perms="COALESCE(telefono, '')", permit_post="''")
+    fecha: str = column(permit_perms="COALESCE(fecha, '')", permit_post="''")
+    hora: str = column(permit_perms="COALESCE(hora, '')", permit_post="''")
+    tipo_novedad: str = column("COALESCE(tipo_novedad, '')")
+    description: str = column("COALESCE(description, '')")
+    files: Union[str, List[str]] = column(permit_perms="COALESCE(files, '')", permit_post="''")
+    createdAt: datetime = column("time_created")
+    status: str = column("COALESCE(solicitud, '')")
+    respuesta: str = column("COALESCE(respuesta, '')")
+    notifications: str = column("COALESCE(notifications, '')")
+    file_name: str = column(permit_perms="COALESCE(file_name, '')", permit_post="''")
+    file_url: str = column(permit_perms="COALESCE(file_url, '')", permit_post="''")
+    zona: str = column(permit_perms="''", permit_post="COALESCE(zona, '')")
+    comp_am: str = column(permit_perms="''", permit_post="COALESCE(comp_am, '')")
+    comp_pm: str = column(permit_perms="''", permit_post="COALESCE(comp_pm, '')")
+    turno: str = column(permit_perms="''", permit_post="COALESCE(turno, '')")
+    request_type: str = column(permit_perms="'permiso'", permit_post="'solicitud'")
+    kind: str = column(permit_perms="'permiso'", permit_post="'equipo'")
+
+    def __post_init__(self):
+        if self.files:
+            self.files = self.files.split(',')
+
+
+@dataclass(slots=True)
+class HistoricalRow:
+    """Fila del agregado semanal en /historical-records."""
+    id: int = column()
+    code: str = column()
+    name: str = column()
+    telefono: str = column("COALESCE(telefono, '')")
+    tipo: str = column("request_type")
+    novedad: str = column("COALESCE(novedad, '')")
+    hora: str = column("COALESCE(hora, '')")
+    fecha_inicio: str = column("COALESCE(DATE_FORMAT(fecha_inicio, '%%Y-%%m-%%d'), '')")
+    fecha_fin: str = column("COALESCE(DATE_FORMAT(fecha_fin, '%%Y-%%m-%%d'), '')")
+    description: str = column("COALESCE(description, '')")
+    respuesta: str = column("COALESCE(respuesta, '')")
+    solicitud: str = column("COALESCE(solicitud, '')")
+    request_type: str = column()
@@ -0,0 +1,155 @@
+"""Agregado semanal de novedades aprobadas que alimenta /historical-records.
+
+Cada fila resume, para una semana (lunes a domingo, es decir una semana ISO),
+un empleado y un tipo de novedad, las solicitudes aprobadas creadas en esa semana.
+Los endpoints que crean, aprueban o eliminan solicitudes recalculan solo el trozo
+(semana, empleado, tipo de solicitud) afectado.
+
+Uso:
+    python rollups.py --rebuild    # recalcula toda la tabla
+"""
+import sys
+from datetime import datetime, timedelta
+from records import HistoricalRow, select_list
+
+ROLLUP_TABLE = "weekly_novelty_rollup"
+
+REQUEST_TABLES = {"permiso": "permit_perms", "equipo": "permit_post"}
+
+_WEEK_EXPR = "DATE(DATE_SUB(time_created, INTERVAL WEEKDAY(time_created) DAY))"
+
+_SELECTS = {
+    "permiso": f"""
+        SELECT
+            {_WEEK_EXPR} AS week_start,
+            p.code,
+            'permiso' AS request_type,
+            COALESCE(p.tipo_novedad, '') AS novedad,
+            p.name,
+            ANY_VALUE(p.id),
+            ANY_VALUE(p.telefono),
+            ANY_VALUE(p.hora),
+            MIN(d.day),
+            MAX(d.day),
+            ANY_VALUE(p.description),
+            ANY_VALUE(p.respuesta),
+            ANY_VALUE(p.solicitud),
+            COUNT(DISTINCT p.id)
+        FROM permit_perms p
+        LEFT JOIN permit_days d ON d.permit_id = p.id
+        WHERE p.solicitud = 'approved'
+            AND p.tipo_novedad NOT IN ('descanso', 'licencia')
+            {{filters}}
+        GROUP BY week_start, p.code, p.name, novedad
+    """,
+    "equipo": f"""
+        SELECT
+            {_WEEK_EXPR} AS week_start,
+            code,
+            'equipo' AS request_type,
+            COALESCE(tipo_novedad, '') AS novedad,
+            name,
+            ANY_VALUE(id),
+            '',
+            '',
+            DATE(MIN(time_created)),
+            DATE(MAX(time_created)),
+            ANY_VALUE(description),
+            ANY_VALUE(respuesta),
+            ANY_VALUE(solicitud),
+            COUNT(*)
+        FROM permit_post
+        WHERE solicitud = 'approved'
+            {{filters}}
+        GROUP BY week_start, code, name, novedad
+    """,
+}
+
+_INSERT = f"""
+    INSERT INTO {ROLLUP_TABLE}
+    (week_start, code, request_type, novedad, name, id, telefono, hora,
+     fecha_inicio, fecha_fin, description, respuesta, solicitud, request_count)
+"""
+
+
+def week_start_of(value):
+    """Lunes de la semana a la que pertenece la fecha."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return value - timedelta(days=value.weekday())
+
+
+def weekly_records_statement(week_start):
+    """Lectura de una semana del agregado para /historical-records."""
+    return f"""
+        SELECT {select_list(HistoricalRow)}
+        FROM {ROLLUP_TABLE}
+        WHERE week_start = %s
+        ORDER BY request_type DESC, code, novedad
+    """, (week_start,)
+
+
+def lookup_statement(request_type, request_id):
+    """Consulta (code, time_created) de una solicitud, necesaria para ubicar su trozo."""
+    return f"SELECT code, time_created FROM {REQUEST_TABLES[request_type]} WHERE id = %s", (request_id,)
+
+
+def refresh_statements(request_type, code, created_at):
+    """Sentencias que recalculan el trozo (semana, empleado, tipo) de una solicitud."""
+    return refresh_codes_statements(request_type, [code], created_at)
+
+
+def refresh_codes_statements(request_type, codes, created_at):
+    """Como refresh_statements, pero para varios empleados de la misma semana a la vez."""
+    codes = list(codes)
+    week_start = week_start_of(created_at)
+    code_column = "p.code" if request_type == "permiso" else "code"
+    placeholders = ", ".join(["%s"] * len(codes))
+    filters = f"AND time_created >= %s AND time_created < %s AND {code_column} IN ({placeholders})"
+    return [
+        (
+            f"DELETE FROM {ROLLUP_TABLE} WHERE week_start = %s AND request_type = %s AND code IN ({placeholders})",
+            (week_start, request_type, *codes),
+        ),
+        (
+            _INSERT + _SELECTS[request_type].format(filters=filters),
+            (week_start, week_start + timedelta(days=7), *codes),
+        ),
+    ]
+
+
+def rebuild_statements():
+    statements = [(f"DELETE FROM {ROLLUP_TABLE}", ())]
+    for select in _SELECTS.values():
+        statements.append((_INSERT + select.format(filters=""), ()))
+    return statements
+
+
+def rebuild_rollup(connection):
+    cursor = connection.cursor()
+    try:
+        for query, params in rebuild_statements():
+            cursor.execute(query, params)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    from database import create_connection, close_connection
+
+    if "--rebuild" not in sys.argv[1:]:
+        print(__doc__)
+        sys.exit(1)
+    connection = create_connection()
+    if connection is None:
+        print("Error de conexión a la base de datos")
+        sys.exit(1)
+    try:
+        rebuild_rollup(connection)
+        print("Agregado semanal reconstruido")
+    finally:
+        close_connection(connection)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime  
 
 class LoginRequest(BaseModel):
@@ -39,6 +39,10 @@ class EquipmentRequest(BaseModel):
 class PhoneUpdate(BaseModel):
     phone: str
 
+class RequestStatusUpdate(BaseModel):
+    status: str
+    respuesta: Optional[str] = ""
+
 class NotificationStatusUpdate(BaseModel):
     notification_status: int
     
@@ -46,12 +50,72 @@ class SolicitudResponse(BaseModel):
     id: int
     code: str
     name: str
+    telefono: str
+    fecha: str
+    hora: str
     tipo_novedad: str
     description: str
+    files: str | List[str]
+    createdAt: datetime
     status: str
     respuesta: str
+    notifications: str
+    file_name: str
+    file_url: str
     zona: str | None
+    comp_am: str
+    comp_pm: str
+    turno: str
+    request_type: str
+    kind: str
+
+class PermitListItem(BaseModel):
+    id: int
+    code: str
+    name: str
+    phone: str
+    dates: str | List[str]
+    time: str
+    type: str
+    noveltyType: str
+    description: str
+    files: str | List[str]
+    createdAt: datetime
+    status: str
+    reason: str
+    notifications: str
+    kind: str
+
+class EquipmentListItem(BaseModel):
+    id: int
+    code: str
+    name: str
+    type: str
+    description: str
     createdAt: datetime
+    status: str
+    reason: str
+    notifications: str
+    zona: str
+    codeAM: str
+    codePM: str
+    shift: str
+    kind: str
+
+class HistoricalRecord(BaseModel):
+    id: int
+    code: str
+    name: str
+    telefono: str
+    tipo: str
+    novedad: str
+    hora: str
+    fecha_inicio: str
+    fecha_fin: str
+    description: str
+    respuesta: str
+    solicitud: str
+    request_type: str
     
 class PermitRequest2(BaseModel):
     code: str
@@ -70,4 +134,33 @@ class UserUpdateRequest(BaseModel):
     name: Optional[str] = None
     phone: Optional[str] = None
     email: Optional[str] = None
-    password: Optional[str] = None
\ No newline at end of file
+    password: Optional[str] = None
+
+class BulkStatusItem(BaseModel):
+    id: int
+    kind: Literal["permiso", "equipo"]
+    status: str
+    respuesta: Optional[str] = ""
+
+class BulkStatusUpdate(BaseModel):
+    items: List[BulkStatusItem]
+
+class BulkNotificationItem(BaseModel):
+    id: int
+    kind: Literal["permiso", "equipo"]
+    notification_status: int
+
+class BulkNotificationUpdate(BaseModel):
+    items: List[BulkNotificationItem]
+
+class BulkApprovalItem(BaseModel):
+    id: int
+    approved_by: str = Field(..., min_length=1)
+
+class BulkApprovalUpdate(BaseModel):
+    items: List[BulkApprovalItem]
+
+class PermitBatchRequest(BaseModel):
+    items: List[PermitRequest2]
+    # Si es True se crean los permisos sin conflicto y se informan los demás; si no, el lote entero se rechaza
+    skip_conflicts: bool = False
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos de la API se importan por nombre plano (como en main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
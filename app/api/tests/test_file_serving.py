@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("aiofiles")
+
+from file_serving import _parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=5-5", (5, 5)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "items=0-10",
+    "bytes=0-10,20-30",
+    "bytes=500-100",
+    "bytes=abc-10",
+    "bytes=-",
+    "bytes=1--2",
+    "bytes=10",
+])
+def test_invalid_ranges_are_ignored(header):
+    assert _parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=-0", 1000),
+    ("bytes=1000-", 1000),
+    ("bytes=1000-2000", 1000),
+    ("bytes=-10", 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(ValueError):
+        _parse_range(header, size)
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from pagination import (decode_cursor, encode_cursor, keyset_clause, merge_pages, request_filters,
+                        requests_page_statement)
+from records import PermitListRow
+
+Row = namedtuple("Row", "id createdAt kind")
+
+T1 = datetime(2024, 5, 1, 8, 0, 0)
+T2 = datetime(2024, 5, 1, 9, 30, 15)
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor(T2, 42, "equipo")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (T2, 42, "equipo")
+
+
+def test_cursor_accepts_isoformat_string():
+    assert decode_cursor(encode_cursor(T1.isoformat(), 7, "permiso")) == (T1, 7, "permiso")
+
+
+@pytest.mark.parametrize("cursor", ["", "no-es-base64!", encode_cursor(T1, 1, "x")[:-4]])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises((ValueError, TypeError)):
+        decode_cursor(cursor)
+
+
+def test_keyset_clause():
+    clause, params = keyset_clause((T1, 5, "permiso"))
+    assert clause == "(time_created < %s OR (time_created = %s AND id < %s))"
+    assert params == [T1, T1, 5]
+    clause, _ = keyset_clause((T1, 5, "equipo"), inclusive=True)
+    assert "id <= %s" in clause
+
+
+def test_requests_page_statement_with_cursor():
+    where, params = request_filters(status_filter="approved", cursor=(T1, 5, "permiso"))
+    query, params = requests_page_statement(PermitListRow, "permit_perms", where, params, limit=10)
+    assert "solicitud = %s AND (time_created < %s OR (time_created = %s AND id < %s))" in query
+    assert "ORDER BY time_created DESC, id DESC" in query
+    assert "LIMIT %s" in query
+    assert params == ("approved", T1, T1, 5, 11)
+
+
+def test_requests_page_statement_without_limit():
+    query, params = requests_page_statement(PermitListRow, "permit_perms", *request_filters())
+    assert "WHERE" not in query and "LIMIT" not in query
+    assert params == ()
+
+
+def _rows(kind, *items):
+    return [Row(id, created_at, kind) for created_at, id in items]
+
+
+def test_merge_orders_by_time_id_and_kind():
+    permits = _rows("permiso", (T2, 3), (T1, 9), (T1, 4))
+    equipment = _rows("equipo", (T2, 3), (T1, 5), (T1, 4))
+    page, next_cursor = merge_pages(permits, equipment)
+    assert [(r.createdAt, r.id, r.kind) for r in page] == [
+        (T2, 3, "equipo"), (T2, 3, "permiso"),
+        (T1, 9, "permiso"), (T1, 5, "equipo"),
+        (T1, 4, "equipo"), (T1, 4, "permiso"),
+    ]
+    assert next_cursor is None
+
+
+def test_merge_with_limit_returns_cursor_of_last_row():
+    permits = _rows("permiso", (T2, 3), (T1, 4))
+    equipment = _rows("equipo", (T2, 3), (T1, 4))
+    page, next_cursor = merge_pages(permits, equipment, limit=3)
+    assert [(r.id, r.kind) for r in page] == [(3, "equipo"), (3, "permiso"), (4, "equipo")]
+    assert decode_cursor(next_cursor) == (T1, 4, "equipo")
+
+
+def test_merge_exact_page_has_no_cursor():
+    page, next_cursor = merge_pages(_rows("permiso", (T2, 1)), _rows("equipo", (T1, 1)), limit=2)
+    assert len(page) == 2
+    assert next_cursor is None
@@ -0,0 +1,15 @@
+from datetime import date
+
+import pytest
+
+from permit_days import parse_days
+
+
+def test_parse_days_sorts_and_deduplicates():
+    assert parse_days(["2024-05-03", " 2024-05-01", "2024-05-03", ""]) == [date(2024, 5, 1), date(2024, 5, 3)]
+
+
+@pytest.mark.parametrize("dates", [[1, 2], ["2024-05-01", None], "2024-05-01", {"a": 1}, ["2024-13-01"], ["01/05/2024"]])
+def test_parse_days_rejects_invalid_input(dates):
+    with pytest.raises(ValueError):
+        parse_days(dates)
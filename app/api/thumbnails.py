@@ -0,0 +1,114 @@
+"""Miniaturas WebP de imágenes y de la primera página de los PDF adjuntos.
+
+Se generan en un pool de procesos para no ocupar los workers de uvicorn: en segundo
+plano al subir el archivo y, si faltan, bajo demanda al pedir /files/{filename}/thumb.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 70
+THUMBNAIL_SUFFIX = ".thumb.webp"
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+_executor = None
+_pending = {}  # ruta de la miniatura -> futuro en curso
+
+
+def thumbnail_path(path):
+    return path + THUMBNAIL_SUFFIX
+
+
+def _render_thumbnail(source, destination):
+    """Se ejecuta en un proceso aparte; importa Pillow/pypdfium2 solo allí."""
+    from PIL import Image
+
+    if source.lower().endswith(".pdf"):
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(source)
+        try:
+            page = pdf[0]
+            # Escala suficiente para que el lado mayor quede cerca del tamaño final
+            width, height = page.get_size()
+            scale = max(THUMBNAIL_SIZE) / max(width, height)
+            image = page.render(scale=max(scale, 0.1)).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(source)
+        image.draft("RGB", THUMBNAIL_SIZE)  # decodificación reducida para JPEG grandes
+
+    image = image.convert("RGB")
+    image.thumbnail(THUMBNAIL_SIZE)
+    tmp = destination + ".tmp"
+    image.save(tmp, "WEBP", quality=THUMBNAIL_QUALITY)
+    os.replace(tmp, destination)
+    return destination
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _render_in_pool(source, destination):
+    """Si un proceso del pool murió (p. ej. por memoria), el pool queda inservible:
+    se descarta y se reintenta una vez con uno nuevo."""
+    global _executor
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        executor = _get_executor()
+        try:
+            return await loop.run_in_executor(executor, _render_thumbnail, source, destination)
+        except BrokenProcessPool:
+            if _executor is executor:
+                _executor = None
+            if attempt:
+                raise
+            logger.warning("Pool de miniaturas roto; se crea uno nuevo")
+
+
+def ensure_thumbnail(source):
+    """Encola la miniatura si no existe; devuelve un futuro asyncio con su ruta."""
+    destination = thumbnail_path(source)
+    future = _pending.get(destination)
+    if future is not None:
+        return future
+
+    loop = asyncio.get_running_loop()
+    if os.path.exists(destination):
+        future = loop.create_future()
+        future.set_result(destination)
+        return future
+
+    future = asyncio.ensure_future(_render_in_pool(source, destination))
+    _pending[destination] = future
+
+    def _done(f):
+        _pending.pop(destination, None)
+        if not f.cancelled() and f.exception() is not None:
+            logger.warning(f"No se pudo generar la miniatura de {source}: {f.exception()}")
+
+    future.add_done_callback(_done)
+    return future
+
+
+def schedule_thumbnails(paths):
+    """Genera en segundo plano las miniaturas de los adjuntos recién subidos."""
+    for path in paths:
+        ensure_thumbnail(path)
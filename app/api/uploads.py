@@ -0,0 +1,229 @@
+"""Almacén de adjuntos direccionado por contenido.
+
+Un blob puede quedar sin referencias si falla la inserción de la solicitud que lo subió
+(no se borra en ese momento porque otra petición en curso puede haber subido el mismo
+contenido). La limpieza borra los blobs que ninguna fila de attachments referencia y que
+tienen más de BLOB_GC_GRACE_SECONDS, junto con sus miniaturas y los temporales antiguos.
+
+Uso:
+    python uploads.py --sweep      # borra blobs huérfanos
+    python uploads.py --dry-run    # solo los lista
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import time
+import uuid
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from thumbnails import thumbnail_path
+
+UPLOAD_DIR = "uploads"
+# Almacén direccionado por contenido: uploads/blobs/ab/cd/<sha256>.<ext>
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", str(10 * 1024 * 1024)))
+MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", str(25 * 1024 * 1024)))
+
+# Firmas (magic bytes) de los tipos de archivo permitidos
+FILE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF-", "application/pdf"),
+]
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "application/pdf": ".pdf"}
+
+# Antigüedad mínima de un blob huérfano para borrarlo: mayor que la duración de cualquier petición
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", str(24 * 3600)))
+
+BLOB_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(jpg|png|pdf)$")
+
+os.makedirs(BLOB_DIR, exist_ok=True)
+os.makedirs(TMP_DIR, exist_ok=True)
+
+
+def sniff_content_type(head: bytes):
+    """Tipo real del archivo según sus primeros bytes, o None si no está permitido."""
+    for signature, content_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+def is_blob_name(filename):
+    return bool(BLOB_NAME_RE.match(filename))
+
+
+def blob_path(blob_name):
+    return os.path.join(BLOB_DIR, blob_name[:2], blob_name[2:4], blob_name)
+
+
+def resolve_file(filename):
+    """Ruta en disco de un adjunto: blob direccionado por contenido o archivo antiguo en uploads/."""
+    if is_blob_name(filename):
+        path = blob_path(filename)
+    else:
+        # Archivos subidos antes del almacén por contenido
+        path = os.path.join(UPLOAD_DIR, os.path.basename(filename))
+    return path if os.path.isfile(path) else None
+
+
+class UploadBudget:
+    """Límite de bytes compartido por todos los archivos de una misma petición."""
+
+    def __init__(self, max_bytes=MAX_UPLOAD_REQUEST_BYTES):
+        self.remaining = max_bytes
+
+    def consume(self, size):
+        self.remaining -= size
+        if self.remaining < 0:
+            raise HTTPException(status_code=413, detail="Los archivos superan el tamaño máximo permitido por solicitud")
+
+
+async def save_upload(file: UploadFile, budget: UploadBudget):
+    """Guarda el archivo por bloques en el almacén, validando su tipo real y su tamaño.
+
+    Devuelve los metadatos del adjunto; si el contenido ya existía no se escribe de nuevo.
+    """
+    head = await file.read(UPLOAD_CHUNK_SIZE)
+    content_type = sniff_content_type(head)
+    if content_type is None:
+        raise HTTPException(status_code=400, detail=f"Tipo de archivo no permitido: {file.content_type}")
+
+    original_name = os.path.basename(file.filename or "archivo")
+    tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as buffer:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_FILE_BYTES:
+                    raise HTTPException(status_code=413, detail=f"El archivo {original_name} supera el tamaño máximo permitido")
+                budget.consume(len(chunk))
+                hasher.update(chunk)
+                await buffer.write(chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+
+        blob_name = f"{hasher.hexdigest()}{EXTENSIONS[content_type]}"
+        final_path = blob_path(blob_name)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            # Reutilizado: se reinicia el periodo de gracia para que la limpieza no lo borre
+            os.utime(final_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"blob": blob_name, "fileName": original_name, "contentType": content_type, "size": size}
+
+
+async def save_uploads(files):
+    """Guarda varios archivos en paralelo.
+
+    Los blobs ya guardados no se borran si otro falla, porque pueden estar
+    compartidos con otras solicitudes.
+    """
+    budget = UploadBudget()
+    results = await asyncio.gather(*(save_upload(f, budget) for f in files), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def insert_attachments(cursor, request_kind, request_id, stored):
+    if not stored:
+        return
+    await cursor.executemany(
+        """
+        INSERT INTO attachments (request_kind, request_id, sha256, blob_name, file_name, content_type, size)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """,
+        [(request_kind, request_id, s["blob"].split(".")[0], s["blob"], s["fileName"], s["contentType"], s["size"])
+         for s in stored]
+    )
+
+
+def _old_files(directory, cutoff):
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    yield name, path
+            except FileNotFoundError:
+                continue
+
+
+def sweep_orphan_blobs(connection, grace_seconds=BLOB_GC_GRACE_SECONDS, dry_run=False, chunk_size=500):
+    """Borra los blobs sin filas en attachments y los temporales, pasado el periodo de gracia.
+
+    Devuelve la lista de blobs huérfanos encontrados.
+    """
+    cutoff = time.time() - grace_seconds
+    candidates = {name: path for name, path in _old_files(BLOB_DIR, cutoff) if is_blob_name(name)}
+    names = sorted(candidates)
+    referenced = set()
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(names), chunk_size):
+            chunk = names[start:start + chunk_size]
+            cursor.execute(
+                f"SELECT DISTINCT blob_name FROM attachments WHERE blob_name IN ({', '.join(['%s'] * len(chunk))})",
+                chunk
+            )
+            referenced.update(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+    orphans = [name for name in names if name not in referenced]
+    if dry_run:
+        return orphans
+    for name in orphans:
+        path = candidates[name]
+        try:
+            # Reutilizado por una subida durante la limpieza (ver save_upload)
+            if os.stat(path).st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        for target in (path, thumbnail_path(path)):
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+    for _, path in _old_files(TMP_DIR, cutoff):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return orphans
+
+
+if __name__ == "__main__":
+    from database import create_connection, close_connection
+
+    dry_run = "--dry-run" in sys.argv[1:]
+    if not dry_run and "--sweep" not in sys.argv[1:]:
+        print(__doc__)
+        sys.exit(1)
+    connection = create_connection()
+    if connection is None:
+        print("Error de conexión a la base de datos")
+        sys.exit(1)
+    try:
+        orphans = sweep_orphan_blobs(connection, dry_run=dry_run)
+        for name in orphans:
+            print(name)
+        print(f"{len(orphans)} blobs huérfanos {'encontrados' if dry_run else 'borrados'}")
+    finally:
+        close_connection(connection)
@@ -0,0 +1,175 @@
+"""Importación masiva de usuarios desde CSV o JSON lines.
+
+El archivo se recorre fila a fila sin cargarlo entero (las lecturas, que son
+bloqueantes, se hacen en el pool de hilos por bloques de filas), cada fila se valida con
+UserResponse y las válidas se insertan o actualizan en bloques, un bloque por
+transacción, con sentencias INSERT ... ON DUPLICATE KEY UPDATE de varias filas.
+"""
+import csv
+import io
+import json
+import itertools
+import os
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from async_database import acquire_connection
+from schemas import UserResponse
+
+IMPORT_CHUNK_SIZE = int(os.getenv("USER_IMPORT_CHUNK_SIZE", "500"))
+# Tope de errores detallados en la respuesta; el conteo total siempre se informa
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl"}
+
+UPSERT_QUERY = """
+    INSERT INTO users (code, name, telefone, email, password)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        name = VALUES(name),
+        telefone = COALESCE(VALUES(telefone), telefone),
+        email = COALESCE(VALUES(email), email),
+        password = COALESCE(VALUES(password), password)
+"""
+
+
+def detect_format(filename, explicit=None):
+    if explicit:
+        return explicit
+    return FORMATS.get(os.path.splitext(filename or "")[1].lower(), "csv")
+
+
+def iter_records(binary_file, format):
+    """Genera (número de fila, dict o mensaje de error) leyendo el archivo de forma incremental."""
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        if format == "csv":
+            reader = csv.DictReader(text)
+            for record in reader:
+                # Fila 1 es la cabecera
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, f"JSON inválido: {e.msg}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, "Se esperaba un objeto JSON por línea"
+                    continue
+                yield line_number, record
+    finally:
+        text.detach()
+
+
+def _next_batch(records, size=IMPORT_CHUNK_SIZE):
+    return list(itertools.islice(records, size))
+
+
+def validate_record(record):
+    """UserResponse a partir de la fila; las celdas vacías cuentan como ausentes."""
+    cleaned = {key.strip(): value.strip() if isinstance(value, str) else value
+               for key, value in record.items() if key}
+    cleaned = {key: value for key, value in cleaned.items() if value not in ("", None)}
+    return UserResponse(**cleaned)
+
+
+def _describe(error: ValidationError):
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.codes = []
+
+    def error(self, row, message, code=None):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "code": code, "error": message})
+
+    def as_dict(self):
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.error_count,
+            "errors": self.errors,
+        }
+
+
+async def _upsert_chunk(connection, chunk, report):
+    """chunk: lista de (fila, UserResponse). Una transacción por bloque."""
+    codes = [user.code for _, user in chunk]
+    async with connection.cursor() as cursor:
+        await connection.begin()
+        try:
+            await cursor.execute(
+                f"SELECT code FROM users WHERE code IN ({', '.join(['%s'] * len(codes))}) FOR UPDATE",
+                codes
+            )
+            existing = {row[0] for row in await cursor.fetchall()}
+
+            values = []
+            for row, user in chunk:
+                if user.code not in existing and not user.password:
+                    report.error(row, "La contraseña es obligatoria para usuarios nuevos", user.code)
+                    continue
+                values.append((user.code, user.name, user.phone, user.email, user.password))
+
+            if values:
+                await cursor.executemany(UPSERT_QUERY, values)
+            await connection.commit()
+        except Exception as e:
+            await connection.rollback()
+            for row, user in chunk:
+                report.error(row, f"Error de base de datos: {str(e)}", user.code)
+            return
+
+    for code, *_ in values:
+        if code in existing:
+            report.updated += 1
+        else:
+            report.inserted += 1
+        report.codes.append(code)
+
+
+async def import_users(binary_file, format):
+    report = ImportReport()
+    seen = {}
+    chunk = []
+    records = iter_records(binary_file, format)
+    async with acquire_connection() as connection:
+        while True:
+            # El archivo subido es un SpooledTemporaryFile: leerlo bloquea, no se hace en el loop
+            batch = await run_in_threadpool(_next_batch, records)
+            if not batch:
+                break
+            for row, record in batch:
+                report.processed += 1
+                if isinstance(record, str):
+                    report.error(row, record)
+                    continue
+                try:
+                    user = validate_record(record)
+                except ValidationError as e:
+                    report.error(row, _describe(e), record.get("code"))
+                    continue
+                if user.code in seen:
+                    report.error(row, f"Código repetido en el archivo (fila {seen[user.code]})", user.code)
+                    continue
+                seen[user.code] = row
+
+                chunk.append((row, user))
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    await _upsert_chunk(connection, chunk, report)
+                    chunk = []
+        if chunk:
+            await _upsert_chunk(connection, chunk, report)
+    return report
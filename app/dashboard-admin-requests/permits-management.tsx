@@ -11,7 +11,7 @@ import { Badge } from "@/components/ui/badge"
 import { toast } from "@/components/ui/use-toast"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import RequestDetails from "../../components/request-details"
-import { fetchRequests, updateRequestStatus, deleteRequest } from "../utils/api"
+import { fetchRequests, updateRequestStatus, deleteRequest, type RequestKind } from "../utils/api"
 import "./permits-management.css"
 import { ContextMenu, ContextMenuContent, ContextMenuItem, ContextMenuTrigger } from "@/components/ui/context-menu"
 import { motion, AnimatePresence } from "framer-motion"
@@ -49,6 +49,9 @@ type Request = {
   [key: string]: string | string[] | undefined
 }
 
+// Los ids se repiten entre permisos y equipos: la selección se identifica por tipo e id
+const selectionKey = (request: Request) => `${request.kind}:${request.id}`
+
 type GroupedRequests = {
   [key: string]: Request[]
 }
@@ -674,10 +677,10 @@ export default function PermitsManagement() {
     }
   }, [])
 
-  const handleRequestAction = async (id: string, action: "approve" | "reject", reason: string) => {
+  const handleRequestAction = async (id: string, action: "approve" | "reject", reason: string, kind: RequestKind) => {
     try {
       // Aquí se llama a updateRequestStatus que ahora envía { status, respuesta } al backend.
-      await updateRequestStatus(id, action, reason)
+      await updateRequestStatus(id, kind, action, reason)
       await loadRequests()
       setSelectedRequests(null)
       setCustomResponse("")
@@ -697,7 +700,7 @@ export default function PermitsManagement() {
 
   const handleDeleteRequest = async (request: Request) => {
     try {
-      await deleteRequest(request.id)
+      await deleteRequest(request.id, request.kind as RequestKind)
       await loadRequests()
 
       const currentPageRequests = Object.values(filteredRequests).flat().length - (currentPage - 1) * requestsPerPage
@@ -731,10 +734,11 @@ export default function PermitsManagement() {
     if (isShiftKeyPressed) {
       setSelectedRequestIds((prev) => {
         const newSet = new Set(prev)
-        if (newSet.has(request.id)) {
-          newSet.delete(request.id)
+        const key = selectionKey(request)
+        if (newSet.has(key)) {
+          newSet.delete(key)
         } else {
-          newSet.add(request.id)
+          newSet.add(key)
         }
         return newSet
       })
@@ -757,8 +761,10 @@ export default function PermitsManagement() {
       )
     })
     try {
-      for (const id of selectedRequestIds) {
-        await handleRequestAction(id, action, message)
+      for (const key of selectedRequestIds) {
+        const request = requests.find((r) => selectionKey(r) === key)
+        if (!request) continue
+        await handleRequestAction(request.id, action, message, request.kind as RequestKind)
         processedRequests++
         setBulkActionProgress((processedRequests / totalRequests) * 100)
       }
@@ -798,7 +804,7 @@ export default function PermitsManagement() {
           <ContextMenuTrigger>
             <Card
               className={`h-full bg-white shadow-sm hover:shadow-md transition-all duration-300 ${
-                requests.some((req) => selectedRequestIds.has(req.id)) ? "ring-2 ring-green-500" : ""
+                requests.some((req) => selectedRequestIds.has(selectionKey(req))) ? "ring-2 ring-green-500" : ""
               }`}
             >
               <CardHeader className="space-y-2">
@@ -828,7 +834,7 @@ export default function PermitsManagement() {
                     <div key={request.id} className="space-y-2">
                       <button
                         className={`w-full text-left p-2 rounded-lg hover:bg-gray-50 transition-colors flex items-center space-x-3 ${
-                          selectedRequestIds.has(request.id) ? "bg-green-100" : ""
+                          selectedRequestIds.has(selectionKey(request)) ? "bg-green-100" : ""
                         }`}
                         onClick={() => handleRequestClick(request)}
                       >
@@ -1223,10 +1229,10 @@ export default function PermitsManagement() {
             </AlertDialogDescription>
           </AlertDialogHeader>
           <div className="max-h-60 overflow-y-auto">
-            {Array.from(selectedRequestIds).map((id) => {
-              const request = requests.find((r) => r.id === id)
+            {Array.from(selectedRequestIds).map((key) => {
+              const request = requests.find((r) => selectionKey(r) === key)
               return request ? (
-                <div key={id} className="py-2 border-b last:border-b-0">
+                <div key={key} className="py-2 border-b last:border-b-0">
                   <p className="font-medium">{request.name}</p>
                   <p className="text-sm text-gray-500">
                     {request.code} - {request.type}
@@ -10,12 +10,16 @@ export async function fetchRequests() {
   return response.json();
 }
 
+// Los ids de permisos y de equipos se repiten entre tablas; kind indica cuál es
+export type RequestKind = 'permiso' | 'equipo';
+
 export async function updateRequestStatus(
   id: string,
+  kind: RequestKind,
   action: 'approve' | 'reject',
   reason: string
 ) {
-  const response = await fetch(`${API_URL}/requests/${id}`, {
+  const response = await fetch(`${API_URL}/requests/${id}?kind=${kind}`, {
     method: 'PUT',
     headers: {
       'Content-Type': 'application/json'
@@ -33,8 +37,8 @@ export async function updateRequestStatus(
   return response.json();
 }
 
-export async function deleteRequest(id: string): Promise<void> {
-  const response = await fetch(`${API_URL}/requests/${id}`, {
+export async function deleteRequest(id: string, kind: RequestKind): Promise<void> {
+  const response = await fetch(`${API_URL}/requests/${id}?kind=${kind}`, {
     method: 'DELETE',
   });
 
@@ -16,7 +16,7 @@ interface NotificationItemProps {
     notifications: number
   }
   onMarkAsRead: (id: number) => void
-  onUpdateStatus: (id: number, status: number) => Promise<void>
+  onUpdateStatus: (id: number, status: number, kind: 'permiso' | 'equipo') => Promise<void>
 }
 
 export default function NotificationItem({ notification, onMarkAsRead, onUpdateStatus }: NotificationItemProps) {
@@ -80,7 +80,7 @@ export default function NotificationItem({ notification, onMarkAsRead, onUpdateS
       onClick={() => {
         onMarkAsRead(notification.id)
         if (notification.notifications === 0 && notification.status !== 'pending') {
-          onUpdateStatus(notification.id, notification.notifications)
+          onUpdateStatus(notification.id, notification.notifications, notification.type)
             .catch(error => {
               console.error('Failed to update notification status:', error)
               toast({
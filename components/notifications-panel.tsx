@@ -57,7 +57,7 @@ export default function NotificationsPanel({ onClose, onMarkAllAsRead }: Notific
       const transformedNotifications = data.map((req: any) => ({
         id: req.id,
         uniqueId: `${req.id}-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`,
-        type: req.noveltyType ? 'permiso' : 'equipo',
+        type: req.kind,
         status: req.status || 'pending',
         date: req.createdAt,
         description: req.noveltyType
@@ -107,10 +107,10 @@ export default function NotificationsPanel({ onClose, onMarkAllAsRead }: Notific
     )
   }, [])
 
-  const updateNotificationStatus = useCallback(async (notificationId: number, currentStatus: number) => {
+  const updateNotificationStatus = useCallback(async (notificationId: number, currentStatus: number, kind: 'permiso' | 'equipo') => {
     try {
       const newStatus = currentStatus === 0 ? 1 : 2
-      const response = await fetch(`https://solicitud-permisos.sao6.com.co/api/requests/${notificationId}/notifications`, {
+      const response = await fetch(`https://solicitud-permisos.sao6.com.co/api/requests/${notificationId}/notifications?kind=${kind}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ notification_status: newStatus }),
@@ -122,7 +122,7 @@ export default function NotificationsPanel({ onClose, onMarkAllAsRead }: Notific
       await response.json()
       setNotifications((prev) =>
         prev.map((notif) =>
-          notif.id === notificationId
+          notif.id === notificationId && notif.type === kind
             ? {
                 ...notif,
                 notifications: newStatus,
@@ -151,7 +151,7 @@ export default function NotificationsPanel({ onClose, onMarkAllAsRead }: Notific
       setIsLoading(true)
       const notificationsToUpdate = notifications.filter(n => n.notifications === 0 && n.status !== 'pending')
       for (const notification of notificationsToUpdate) {
-        await updateNotificationStatus(notification.id, 0)
+        await updateNotificationStatus(notification.id, 0, notification.type)
       }
       toast({
         title: "Éxito",
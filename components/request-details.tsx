@@ -72,7 +72,7 @@ type HistoryItem = {
 type RequestDetailsProps = {
   requests: Request[]
   onClose: () => void
-  onAction: (id: string, action: "approve" | "reject", reason: string) => void
+  onAction: (id: string, action: "approve" | "reject", reason: string, kind: "permiso" | "equipo") => void
 }
 
 // Utility Functions
@@ -1083,7 +1083,7 @@ const RequestDetails = ({ requests, onClose, onAction }: RequestDetailsProps) =>
   }
 
   const handleAction = (action: "approve" | "reject") => {
-    onAction(currentRequest.id, action, reason)
+    onAction(currentRequest.id, action, reason, currentRequest.kind)
   }
 
   const getSections = () => {